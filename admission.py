@@ -0,0 +1,113 @@
+# admission.py
+# 推荐接口的准入控制与请求时限：
+# - AdmissionController：限制同时处理的请求数，超出部分在有界队列中等待，队列满时立即拒绝（503）
+# - Deadline：每个请求的截止时间，向下传递到 recommend_battery，临近截止时返回部分结果
+import threading
+import time
+
+DEADLINE_MARGIN = 0.2  # 距截止不足该秒数即视为“临近截止”
+
+
+class Deadline:
+    """
+    请求截止时间（基于 time.monotonic）。truncated 由推荐逻辑在提前截断结果时置为True；
+    pending 为超时后仍在子进程中运行的任务（future），其准入槽位须等任务结束再释放。
+    Per-request deadline; `truncated` is set when results were cut short.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.truncated = False
+        self.pending = None
+
+    @classmethod
+    def until(cls, wall_time):
+        """由绝对时间（time.time()）构造，用于跨进程传递截止时间。"""
+        return cls(wall_time - time.time())
+
+    def wall_clock(self):
+        """截止时间对应的 time.time() 值。"""
+        return time.time() + self.remaining()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def near(self, margin=DEADLINE_MARGIN):
+        return self.remaining() <= margin
+
+
+class AdmissionController:
+    """
+    有界准入：最多 max_concurrent 个请求同时执行，最多 max_queue 个请求排队等待。
+    Bounded admission with a fixed number of execution slots and a bounded wait queue.
+    """
+
+    ADMITTED = "admitted"
+    REJECTED = "rejected"  # 队列已满，立即拒绝
+    TIMED_OUT = "timed_out"  # 排队期间已到截止时间
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        self.counters = {"admitted": 0, "rejected": 0, "queue_timeouts": 0}
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline):
+        """申请执行槽位，最多等待到 deadline；返回 ADMITTED/REJECTED/TIMED_OUT。"""
+        with self._cond:
+            if self.in_flight < self.max_concurrent and self.queued == 0:
+                self.in_flight += 1
+                self.counters["admitted"] += 1
+                return self.ADMITTED
+            if self.queued >= self.max_queue:
+                self.counters["rejected"] += 1
+                return self.REJECTED
+            self.queued += 1
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline.remaining()
+                    if remaining <= 0:
+                        self.counters["queue_timeouts"] += 1
+                        return self.TIMED_OUT
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+                self.counters["admitted"] += 1
+                return self.ADMITTED
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def release_for(self, deadline):
+        """
+        请求结束时释放槽位；若仍有超时未能取消的子进程任务（deadline.pending），等其结束后再释放，
+        保证进程池中实际运行的任务数不超过 max_concurrent。
+        """
+        if deadline.pending is None:
+            self.release()
+        else:
+            deadline.pending.add_done_callback(lambda _: self.release())
+
+    def record(self, name):
+        """累加自定义计数（如 truncated、deadline_exceeded）。"""
+        with self._cond:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self.counters,
+                in_flight=self.in_flight,
+                queued=self.queued,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+            )
@@ -1,8 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from battery_recommend import recommend_battery
+from battery_recommend import recommend_battery, recommend_with_deadline
+from http_cache import VersionedCache, files_version, compress_response
+from admission import AdmissionController, Deadline
+import fleet_export
+import concurrent.futures
+import multiprocessing
+import threading
+import time
 import html
 import logging
+import os
 import sys
 import math
 import numpy as np
@@ -18,6 +26,35 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 
+# 可通过环境变量覆盖，便于压测时指向本地汇率桩服务、把推荐日志写到临时文件
+EXCHANGE_RATE_URL = os.environ.get("EXCHANGE_RATE_URL", "https://api.exchangerate.host/latest?base=EUR&symbols=USD")
+RECOMMEND_LOG = os.environ.get("RECOMMEND_LOG", "flask.log")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 数据版本由这些文件的内容决定，变化后ETag随之变化
+CATALOG_FILES = ["all_data.csv", "all_forklift_models.txt", "train_data.csv"]
+# 型号列表：浏览器缓存5分钟，过期后凭ETag条件请求；首页：每次凭ETag校验，便于前端更新及时生效
+MODELS_CACHE_CONTROL = "public, max-age=300"
+INDEX_CACHE_CONTROL = "no-cache"
+BODY_CACHE = VersionedCache()
+
+# 推荐接口准入控制：同时执行数、排队上限、默认时限（秒），以及可选的进程池（0为不启用，在请求线程内计算）
+RECOMMEND_MAX_CONCURRENT = int(os.environ.get("RECOMMEND_MAX_CONCURRENT", 4))
+RECOMMEND_MAX_QUEUE = int(os.environ.get("RECOMMEND_MAX_QUEUE", 16))
+RECOMMEND_TIMEOUT = float(os.environ.get("RECOMMEND_TIMEOUT", 10))
+RECOMMEND_PROCESS_POOL = int(os.environ.get("RECOMMEND_PROCESS_POOL", 0))
+RECOMMEND_ADMISSION = AdmissionController(RECOMMEND_MAX_CONCURRENT, RECOMMEND_MAX_QUEUE)
+_recommend_pool = None
+_recommend_pool_lock = threading.Lock()
+# 批量导出：单次最多的输入行数、整个导出的时限（秒）、同时进行的导出数及排队上限；
+# 每个输入另需占用一个推荐接口准入槽位，与 /api/recommend 共用计算容量
+EXPORT_MAX_INPUTS = int(os.environ.get("EXPORT_MAX_INPUTS", 5000))
+EXPORT_TIMEOUT = float(os.environ.get("EXPORT_TIMEOUT", 600))
+EXPORT_MAX_CONCURRENT = int(os.environ.get("EXPORT_MAX_CONCURRENT", 1))
+EXPORT_MAX_QUEUE = int(os.environ.get("EXPORT_MAX_QUEUE", 0))
+EXPORT_SLOT_RETRY = 0.5  # 推荐接口队列已满时，导出等待后重试的间隔（秒）
+EXPORT_ADMISSION = AdmissionController(EXPORT_MAX_CONCURRENT, EXPORT_MAX_QUEUE)
+
 def safe_str(val):
     if val is None:
         return "-"
@@ -54,29 +91,31 @@ def clean_json(obj):
         return "-"
     return obj
 
-def format_result_table(result_dict, discount=None):
+# 推荐结果字段顺序与显示名映射（推荐表格与批量导出共用）
+RESULT_FIELD_MAP = [
+    ("适用叉车型号", "适用叉车型号"),
+    ("锂电池型号", "锂电池型号"),
+    ("电芯品牌", "电芯品牌"),
+    ("电压(V)", "电压(V)"),
+    ("对应铅酸电池电压(V)", "对应铅酸电池电压(V)"),
+    ("容量(Ah)", "容量(Ah)"),
+    ("单体电芯容量(Ah)", "单体电芯容量(Ah)"),
+    ("模组串并联方式", "模组串并联方式"),
+    ("模组配置(串S并P联）", "模组配置(串S并P联）"),
+    ("尺寸(mm)", "尺寸(mm)"),
+    ("总重量(kg)", "总重量(kg)"),
+    ("含配重(kg)", "含配重(kg)"),
+    ("惠州出厂价(USD)", "惠州出厂价(USD)折后价（不含VAT税）"),
+    ("荷兰EXW出货价(EUR)", "荷兰EXW出货价(EUR)折后价（不含VAT税）"),
+    ("汇率(EUR/USD)", "汇率(EUR/USD)")
+]
+
+def result_table_rows(result_dict, discount=None):
+    """按 RESULT_FIELD_MAP 返回 [(显示名, 显示值)]，价格已按折扣率折算"""
     # 先递归清理所有 NaN/None
     show = clean_json(result_dict)
-    # 字段顺序与映射
-    field_map = [
-        ("适用叉车型号", "适用叉车型号"),
-        ("锂电池型号", "锂电池型号"),
-        ("电芯品牌", "电芯品牌"),
-        ("电压(V)", "电压(V)"),
-        ("对应铅酸电池电压(V)", "对应铅酸电池电压(V)"),
-        ("容量(Ah)", "容量(Ah)"),
-        ("单体电芯容量(Ah)", "单体电芯容量(Ah)"),
-        ("模组串并联方式", "模组串并联方式"),
-        ("模组配置(串S并P联）", "模组配置(串S并P联）"),
-        ("尺寸(mm)", "尺寸(mm)"),
-        ("总重量(kg)", "总重量(kg)"),
-        ("含配重(kg)", "含配重(kg)"),
-        ("惠州出厂价(USD)", "惠州出厂价(USD)折后价（不含VAT税）"),
-        ("荷兰EXW出货价(EUR)", "荷兰EXW出货价(EUR)折后价（不含VAT税）"),
-        ("汇率(EUR/USD)", "汇率(EUR/USD)")
-    ]
-    table = '<table style="border-collapse:separate;border-spacing:0 8px;min-width:420px;width:80%;">'
-    for k, k2 in field_map:
+    rows = []
+    for k, k2 in RESULT_FIELD_MAP:
         if k == "模组串并联方式":
             v1 = show.get("模组串并联方式")
             v2 = show.get("模组配置(串S并P联）")
@@ -99,16 +138,25 @@ def format_result_table(result_dict, discount=None):
             v = show.get(k) if show.get(k) not in [None, "", "nan"] else "-"
         if k == "模组配置(串S并P联）":
             continue
+        rows.append((k2, v))
+    return rows
+
+# 批量导出的结果列（模组配置已并入模组串并联方式，不单独成列）
+EXPORT_VALUE_COLUMNS = [k2 for k, k2 in RESULT_FIELD_MAP if k != "模组配置(串S并P联）"]
+
+def format_result_table(result_dict, discount=None):
+    table = '<table style="border-collapse:separate;border-spacing:0 8px;min-width:420px;width:80%;">'
+    for k2, v in result_table_rows(result_dict, discount):
         k2 = html.escape(safe_str(k2).replace('{', '').replace('}', ''))
         v = html.escape(safe_str(v).replace('{', '').replace('}', ''))
         table += '<tr><th style="text-align:right;vertical-align:top;font-weight:bold;padding:8px 18px 8px 0;background:#f6f6f6;font-size:16px;width:220px;">' + k2 + '</th><td style="text-align:left;vertical-align:top;font-weight:normal;padding:8px 0 8px 8px;font-size:16px;">' + v + '</td></tr>'
     table += '</table>'
     return table
 
-def get_eur_usd_rate():
+def get_eur_usd_rate(timeout=3):
     """实时获取欧元对美元汇率（EUR/USD），失败时返回默认值并记录日志"""
     try:
-        resp = requests.get("https://api.exchangerate.host/latest?base=EUR&symbols=USD", timeout=3)
+        resp = requests.get(EXCHANGE_RATE_URL, timeout=timeout)
         if resp.status_code == 200:
             data = resp.json()
             rate = data.get("rates", {}).get("USD")
@@ -118,33 +166,103 @@ def get_eur_usd_rate():
         logging.warning(f"[汇率获取失败] {e}")
     return 1.08  # 默认值，可根据实际情况调整
 
+def prepare_recommend_input(input_data):
+    """就地整理推荐输入（单体电芯容量可选项转为整数列表），返回折扣率(%)，未填写或非法时为None"""
+    cell_caps = input_data.get("单体电芯容量可选项")
+    if cell_caps:
+        try:
+            cell_caps_list = [int(x.strip()) for x in cell_caps.split(",") if x.strip().isdigit()]
+            input_data["单体电芯容量可选项"] = cell_caps_list
+        except Exception:
+            input_data["单体电芯容量可选项"] = []
+    discount = None
+    if "折扣率(%)" in input_data:
+        try:
+            discount = float(input_data["折扣率(%)"])
+        except Exception:
+            discount = None
+    return discount
+
+def get_recommend_pool():
+    global _recommend_pool
+    with _recommend_pool_lock:
+        if _recommend_pool is None:
+            # spawn：子进程不继承请求线程状态，各自加载推荐数据源
+            _recommend_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=RECOMMEND_PROCESS_POOL, mp_context=multiprocessing.get_context("spawn"))
+        return _recommend_pool
+
+def run_recommend(input_data, deadline):
+    """
+    执行推荐计算：启用进程池时提交到子进程（避免GIL串行化），否则在当前线程执行。返回 (结果, 是否被截断)。
+    进程池超时抛出 concurrent.futures.TimeoutError：尚未开始的任务被取消，已在运行的任务记入 deadline.pending，
+    调用方用 RECOMMEND_ADMISSION.release_for(deadline) 释放槽位。
+    """
+    if RECOMMEND_PROCESS_POOL > 0:
+        # 传绝对截止时间：任务在池中排队的时间也计入时限
+        future = get_recommend_pool().submit(recommend_with_deadline, input_data, deadline.wall_clock())
+        try:
+            # 子进程自身会在临近截止时返回部分结果，这里多留1秒传输余量
+            result, truncated = future.result(timeout=deadline.remaining() + 1)
+        except concurrent.futures.TimeoutError:
+            if not future.cancel():
+                deadline.pending = future
+                RECOMMEND_ADMISSION.record("abandoned")
+            raise
+        if result is None and truncated:
+            # 子进程取到任务时已过截止时间
+            raise concurrent.futures.TimeoutError()
+        return result, truncated
+    result = recommend_battery(input_data, deadline=deadline)
+    return result, deadline.truncated
+
+def request_deadline():
+    """请求时限：默认 RECOMMEND_TIMEOUT，客户端可用 X-Request-Timeout（秒）缩短"""
+    timeout = RECOMMEND_TIMEOUT
+    try:
+        timeout = min(timeout, float(request.headers.get("X-Request-Timeout", timeout)))
+    except ValueError:
+        pass
+    return Deadline(max(timeout, 0.0))
+
 @app.route("/api/recommend", methods=["POST"])
 def api_recommend():
+    deadline = request_deadline()
+    status = RECOMMEND_ADMISSION.acquire(deadline)
+    if status != AdmissionController.ADMITTED:
+        msg = "服务繁忙，请稍后重试。" if status == AdmissionController.REJECTED else "排队超时，请稍后重试。"
+        resp = jsonify({"error": msg})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        return resp
+    try:
+        return recommend_response(deadline)
+    finally:
+        RECOMMEND_ADMISSION.release_for(deadline)
+
+def recommend_response(deadline):
     try:
         input_data = request.json
         try:
-            cell_caps = input_data.get("单体电芯容量可选项")
-            if cell_caps:
-                try:
-                    cell_caps_list = [int(x.strip()) for x in cell_caps.split(",") if x.strip().isdigit()]
-                    input_data["单体电芯容量可选项"] = cell_caps_list
-                except Exception:
-                    input_data["单体电芯容量可选项"] = []
-            discount = None
-            if "折扣率(%)" in input_data:
-                try:
-                    discount = float(input_data["折扣率(%)"])
-                except Exception:
-                    discount = None
-            # 实时获取汇率
-            eur_usd_rate = get_eur_usd_rate()
+            discount = prepare_recommend_input(input_data)
+            # 实时获取汇率，超时不超过请求剩余时限
+            eur_usd_rate = get_eur_usd_rate(timeout=min(3, max(deadline.remaining() - 0.5, 0.1)))
             input_data["汇率(EUR/USD)"] = eur_usd_rate
             # 记录输入
-            with open('flask.log', 'a', encoding='utf-8') as f:
+            with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
                 f.write("\n[RECOMMEND INPUT] " + str(input_data) + "\n")
-            result = recommend_battery(input_data)
+            if deadline.expired():
+                RECOMMEND_ADMISSION.record("deadline_exceeded")
+                return jsonify({"error": "推荐超时，请缩小查询范围后重试。"}), 504
+            try:
+                result, truncated = run_recommend(input_data, deadline)
+            except concurrent.futures.TimeoutError:
+                RECOMMEND_ADMISSION.record("deadline_exceeded")
+                return jsonify({"error": "推荐超时，请缩小查询范围后重试。"}), 504
+            if truncated:
+                RECOMMEND_ADMISSION.record("truncated")
             # 记录输出
-            with open('flask.log', 'a', encoding='utf-8') as f:
+            with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
                 f.write("[RECOMMEND OUTPUT] " + str(result) + "\n")
             # 推荐失败
             if result is None or (isinstance(result, dict) and "推荐失败" in result):
@@ -156,7 +274,11 @@ def api_recommend():
                 for k, v in result.items():
                     v.pop("汇率(EUR/USD)", None)
                     tables.append('<h4 style="margin-top:18px;">' + html.escape(safe_str(k)) + '</h4>' + format_result_table(v, discount))
-                return jsonify({"table": "<br>".join(tables), "raw": clean_json(result)})
+                body = {"table": "<br>".join(tables), "raw": clean_json(result)}
+                if truncated:
+                    # 临近截止时间，仅返回已生成的部分结果
+                    body["partial"] = True
+                return jsonify(body)
             # 单条推荐
             if isinstance(result, dict):
                 if "推荐电池型号" in result:
@@ -175,41 +297,156 @@ def api_recommend():
         except Exception as e:
             import traceback
             logging.error("[RECOMMEND ERROR] input=%s error=%s trace=%s", input_data, e, traceback.format_exc())
-            with open('flask.log', 'a', encoding='utf-8') as f:
+            with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
                 f.write("\n[RECOMMEND ERROR] input= " + str(input_data) + "\n")
                 f.write("[RECOMMEND ERROR] error= " + str(e) + "\n")
                 f.write("[RECOMMEND ERROR] trace=\n" + traceback.format_exc() + "\n")
             return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
     except Exception as e:
         import traceback
-        with open('flask.log', 'a', encoding='utf-8') as f:
+        with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
             f.write("\n[RECOMMEND FATAL] error= " + str(e) + "\n")
             f.write("[RECOMMEND FATAL] trace=\n" + traceback.format_exc() + "\n")
         return jsonify({"error": "fatal: " + str(e), "trace": traceback.format_exc()}), 500
 
-@app.route("/api/forklift-models", methods=["GET"])
-def api_forklift_models():
-    import os
-    txt_path = os.path.join(os.path.dirname(__file__), 'all_forklift_models.txt')
+def export_inputs():
+    """批量导出的输入：JSON {"inputs": [...], "defaults": {...}} 或 multipart 上传表格（file）+ 表单字段作为默认值"""
+    if request.files.get("file"):
+        defaults = {k: v for k, v in request.form.items() if k != "format" and v.strip()}
+        return fleet_export.read_fleet_sheet(request.files["file"], defaults)
+    body = request.get_json(silent=True) or {}
+    defaults = body.get("defaults") or {}
+    inputs = body.get("inputs")
+    if not isinstance(inputs, list):
+        raise ValueError("请提供 inputs 列表或上传叉车型号表格")
+    return [dict(defaults, **item) for item in inputs if isinstance(item, dict)]
+
+@app.route("/api/export", methods=["POST"])
+def api_export():
+    # 车队批量报价：逐个输入计算推荐，结果逐行以CSV/XLSX流式返回，内存占用不随车队规模增长
+    fmt = (request.args.get("format") or request.form.get("format")
+           or (request.get_json(silent=True) or {}).get("format") or "csv").lower()
+    if fmt not in fleet_export.EXPORT_FORMATS:
+        return jsonify({"error": f"不支持的导出格式：{fmt}"}), 400
+    try:
+        inputs = export_inputs()
+    except ImportError:
+        return jsonify({"error": "服务器未安装 openpyxl，无法读取xlsx，请上传CSV"}), 400
+    except Exception as e:
+        return jsonify({"error": f"无法读取输入：{e}"}), 400
+    if not inputs:
+        return jsonify({"error": "没有可导出的输入"}), 400
+    if len(inputs) > EXPORT_MAX_INPUTS:
+        return jsonify({"error": f"单次最多导出 {EXPORT_MAX_INPUTS} 条输入"}), 400
+    export_deadline = Deadline(EXPORT_TIMEOUT)
+    status = EXPORT_ADMISSION.acquire(export_deadline)
+    if status != AdmissionController.ADMITTED:
+        resp = jsonify({"error": "已有导出任务在进行，请稍后重试。"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "10"
+        return resp
+    try:
+        # 整个导出共用一次汇率
+        eur_usd_rate = get_eur_usd_rate(timeout=min(3, export_deadline.remaining()))
+    except BaseException:
+        EXPORT_ADMISSION.release()
+        raise
+
+    def recommend(input_data):
+        if export_deadline.expired():
+            if not export_deadline.truncated:
+                export_deadline.truncated = True
+                EXPORT_ADMISSION.record("deadline_exceeded")
+            raise fleet_export.SkipInput("导出超时，未计算")
+        # 每个输入占用一个推荐接口槽位；时限取单次推荐时限与导出剩余时间的较小者
+        deadline = Deadline(min(RECOMMEND_TIMEOUT, export_deadline.remaining()))
+        status = RECOMMEND_ADMISSION.acquire(deadline)
+        while status == AdmissionController.REJECTED and deadline.remaining() > EXPORT_SLOT_RETRY:
+            # 推荐接口排队已满：批量导出让出容量，稍后重试
+            time.sleep(EXPORT_SLOT_RETRY)
+            status = RECOMMEND_ADMISSION.acquire(deadline)
+        if status != AdmissionController.ADMITTED:
+            raise fleet_export.SkipInput("服务繁忙，未计算")
+        try:
+            discount = prepare_recommend_input(input_data)
+            input_data["汇率(EUR/USD)"] = eur_usd_rate
+            with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
+                f.write("\n[RECOMMEND INPUT] " + str(input_data) + "\n")
+            # 临近时限时与推荐接口一样返回部分结果
+            result, truncated = run_recommend(input_data, deadline)
+        except concurrent.futures.TimeoutError:
+            RECOMMEND_ADMISSION.record("deadline_exceeded")
+            raise
+        finally:
+            RECOMMEND_ADMISSION.release_for(deadline)
+        if truncated:
+            RECOMMEND_ADMISSION.record("truncated")
+        with open(RECOMMEND_LOG, 'a', encoding='utf-8') as f:
+            f.write("[RECOMMEND OUTPUT] " + str(result) + "\n")
+        for item in fleet_export.result_items(result)[0] or []:
+            item["汇率(EUR/USD)"] = eur_usd_rate
+        return result, discount, "部分结果（计算超时）" if truncated else ""
+
+    rows = fleet_export.iter_fleet_rows(inputs, recommend, result_table_rows, len(EXPORT_VALUE_COLUMNS))
+    header = fleet_export.export_header(EXPORT_VALUE_COLUMNS)
+    chunks = fleet_export.iter_xlsx(header, rows) if fmt == "xlsx" else fleet_export.iter_csv(header, rows)
+    resp = Response(stream_with_context(chunks), mimetype=fleet_export.content_type(fmt))
+    # 导出槽位在响应关闭时释放（正常结束或客户端断开）
+    resp.call_on_close(EXPORT_ADMISSION.release)
+    resp.headers["Content-Disposition"] = f"attachment; filename=fleet_quote.{fmt}"
+    resp.headers["Cache-Control"] = "no-store"
+    # 关闭反向代理缓冲，首批字节尽早到达客户端
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+def load_forklift_models():
+    txt_path = os.path.join(BASE_DIR, 'all_forklift_models.txt')
     if os.path.exists(txt_path):
         with open(txt_path, encoding="utf-8") as f:
             models = [line.strip() for line in f if line.strip() and line.strip() != "N/A"]
-        models = sorted(set(models))
-        return jsonify(models)
-    import pandas as pd
-    csv_path = os.path.join(os.path.dirname(__file__), 'train_data.csv')
+        return sorted(set(models))
+    csv_path = os.path.join(BASE_DIR, 'train_data.csv')
     df = pd.read_csv(csv_path, usecols=["适用叉车型号"])
     models = df["适用叉车型号"].dropna().unique().tolist()
     models = list(set([m.strip() for m in models if m and str(m).strip() and m != "N/A"]))
     models.sort()
-    return jsonify(models)
+    return models
+
+def catalog_version():
+    """数据版本：推荐数据源与型号列表文件的内容哈希，作为强ETag"""
+    return files_version([os.path.join(BASE_DIR, name) for name in CATALOG_FILES])
+
+@app.route("/api/forklift-models", methods=["GET"])
+def api_forklift_models():
+    # 型号列表按数据版本只构建一次，压缩结果一并缓存；If-None-Match 命中返回304
+    cached = BODY_CACHE.get("forklift-models", catalog_version(), "application/json",
+                            lambda: app.json.response(load_forklift_models()).get_data())
+    return cached.make_response(request, MODELS_CACHE_CONTROL)
+
+@app.route("/api/status", methods=["GET"])
+def api_status():
+    # 推荐接口队列深度、拒绝/超时/截断计数（每个worker进程独立统计）
+    return jsonify({"recommend": RECOMMEND_ADMISSION.stats(), "export": EXPORT_ADMISSION.stats(),
+                    "process_pool": RECOMMEND_PROCESS_POOL, "pid": os.getpid()})
+
+def read_file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
 
 @app.route("/")
 def index():
+    index_path = os.path.join(BASE_DIR, "index.html")
     try:
-        return app.send_static_file("index.html")
+        version = catalog_version() + "-" + files_version([index_path])
+        cached = BODY_CACHE.get("index", version, "text/html", lambda: read_file_bytes(index_path))
+        return cached.make_response(request, INDEX_CACHE_CONTROL)
     except Exception:
         return "<h2>index.html 未找到或无权限</h2>", 404
 
+@app.after_request
+def after_request(response):
+    # 动态JSON/HTML响应（如 /api/recommend）超过阈值时按 Accept-Encoding 压缩
+    return compress_response(response, request)
+
 if __name__ == "__main__":
-    app.run(debug=False, host="0.0.0.0", port=8080)
+    app.run(debug=False, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
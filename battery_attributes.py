@@ -0,0 +1,220 @@
+# battery_attributes.py
+# 从“电池详情”自由文本中抽取关键采购属性（加热、4G、充放电插头、放电线长、UL/IP认证、配重），
+# 入库时一次性抽取为类型化列并保存；加载后为每个可筛选属性建立位图索引，
+# 推荐时的属性筛选只需位图按位与，无需逐行正则扫描。
+import os
+import re
+import numpy as np
+
+from catalog_store import details_fingerprint
+
+# 三态：1 明确带，0 明确不带，-1 未说明
+TRI_ATTRS = ["加热", "4G模块"]
+CONNECTOR_ATTRS = ["放电插头", "充电插头"]
+FLOAT_ATTRS = ["放电线长(m)", "详情配重(kg)"]
+
+# 推荐输入中的布尔筛选字段 -> 位图名
+BOOL_FILTERS = {
+    "需要加热": "加热",
+    "需要4G模块": "4G模块",
+    "需要UL认证": "UL认证",
+    "需要IP65": "IP65",
+}
+
+_NO_HEAT = re.compile(r"(不带|无需|不需要?|无|取消|没有|不)\s*(充电|放电)?\s*加热")
+_NO_4G = re.compile(r"(不带|无需|不需要?|无|取消|没有)\s*(优克联)?\s*4G", re.I)
+_UL = re.compile(r"(?<![A-Za-z])UL(?![A-Za-z])")
+_IP = re.compile(r"IP\s*(\d{2})", re.I)
+_DISCHARGE_SEG = re.compile(r"放电[^，,；;。、]{0,40}")
+_CHARGE_SEG = re.compile(r"充电(?!器)[^，,；;。、]{0,40}")
+_CABLE = re.compile(r"放电线长(?:为|改为|：|:)?\s*([\d.]+)\s*(mm|m|ｍ|米)", re.I)
+_COUNTERWEIGHT = re.compile(r"(?:配重|铁块重量)\s*[:：]?\s*([\d.]+)\s*(?:kg|公斤)", re.I)
+
+
+def normalize_connector(text):
+    """
+    把插头描述归一为型号族，如 "Anderson SB350 Gray" -> "Anderson SB350"，"Rema 320A 母头" -> "REMA 320"。
+    无法识别返回None。
+    Normalize a connector description to its family name, or None.
+    """
+    s = str(text or "").upper().replace("安德森", "ANDERSON")
+    for pat, fmt in [
+        (r"SBE\s*(\d{3})", "Anderson SBE{}"),
+        (r"SBX\s*(\d{3})", "Anderson SBX{}"),
+        (r"SB\s*(\d{2,3})", "Anderson SB{}"),
+        (r"EBC[^0-9]{0,8}?(\d{3})", "Anderson EBC{}"),
+        (r"EURO\s*(\d{3})", "Anderson Euro {}"),
+        (r"REMA[^0-9]{0,12}?(\d{2,3})", "REMA {}"),
+        (r"(\d{3})\s*A?\s*ANDERSON", "Anderson SB{}"),
+        (r"ANDERSON[^0-9]{0,8}?(\d{3})", "Anderson SB{}"),
+    ]:
+        m = re.search(pat, s)
+        if m:
+            return fmt.format(m.group(1))
+    return None
+
+
+def _first_connector(seg_re, text):
+    for m in seg_re.finditer(text):
+        c = normalize_connector(m.group(0))
+        if c:
+            return c
+    return None
+
+
+def extract_attributes(text):
+    """
+    从单条电池详情中抽取属性，返回dict（字段见 TRI_ATTRS/CONNECTOR_ATTRS/FLOAT_ATTRS 及 UL认证、IP等级）。
+    Extract purchasing attributes from one 电池详情 text.
+    """
+    s = "" if text is None or (isinstance(text, float) and text != text) else str(text)
+    attrs = {}
+    if _NO_HEAT.search(s):
+        attrs["加热"] = 0
+    else:
+        attrs["加热"] = 1 if "加热" in s else -1
+    if _NO_4G.search(s):
+        attrs["4G模块"] = 0
+    else:
+        attrs["4G模块"] = 1 if re.search(r"4G", s, re.I) else -1
+    attrs["UL认证"] = bool(_UL.search(s))
+    ips = [int(x) for x in _IP.findall(s)]
+    attrs["IP等级"] = max(ips) if ips else 0
+    attrs["放电插头"] = _first_connector(_DISCHARGE_SEG, s)
+    attrs["充电插头"] = _first_connector(_CHARGE_SEG, s)
+    m = _CABLE.search(s)
+    if m:
+        length = float(m.group(1))
+        # 单位写成m但数值明显是毫米（如“2400ｍ”）时按毫米处理
+        attrs["放电线长(m)"] = length / 1000 if m.group(2).lower() == "mm" or length > 100 else length
+    else:
+        attrs["放电线长(m)"] = np.nan
+    m = _COUNTERWEIGHT.search(s)
+    attrs["详情配重(kg)"] = float(m.group(1)) if m else np.nan
+    return attrs
+
+
+def attribute_path(csv_path):
+    return csv_path + ".attrs.npz"
+
+
+def attribute_columns(texts):
+    """批量抽取属性，返回类型化列dict（插头为编码列 + "_values" 取值表）。"""
+    rows = [extract_attributes(t) for t in texts]
+    cols = {}
+    for name in TRI_ATTRS:
+        cols[name] = np.array([r[name] for r in rows], dtype=np.int8)
+    cols["UL认证"] = np.array([r["UL认证"] for r in rows], dtype=bool)
+    cols["IP等级"] = np.array([r["IP等级"] for r in rows], dtype=np.int16)
+    for name in FLOAT_ATTRS:
+        cols[name] = np.array([r[name] for r in rows], dtype=np.float32)
+    for name in CONNECTOR_ATTRS:
+        values = sorted({r[name] for r in rows if r[name]})
+        lookup = {v: i for i, v in enumerate(values)}
+        cols[name] = np.array([lookup.get(r[name], -1) for r in rows], dtype=np.int16)
+        cols[name + "_values"] = np.array(values, dtype=str)
+    return cols
+
+
+def build_attributes(texts, npz_path):
+    """
+    入库时批量抽取属性并保存为类型化列（.npz），同时记录电池详情内容指纹，用于判断是否过期。
+    Extract attributes for all rows once and save them as typed columns.
+    """
+    cols = attribute_columns(texts)
+    cols["_fingerprint"] = np.array(details_fingerprint(texts))
+    tmp = f"{npz_path}.{os.getpid()}.tmp.npz"
+    # npz键名用序号，避免中文键在不同numpy版本中的兼容问题
+    keys = list(cols)
+    np.savez(tmp, _keys=np.array(keys, dtype=str), **{f"c{i}": cols[k] for i, k in enumerate(keys)})
+    os.replace(tmp, npz_path)
+
+
+class AttributeIndex:
+    """
+    类型化属性列 + 位图索引（np.packbits，每行1bit）。
+    Typed attribute columns with packed bitmap indexes for fast filtering.
+    """
+
+    def __init__(self, cols):
+        self.fingerprint = str(cols.pop("_fingerprint", ""))
+        self.cols = cols
+        self.rows = len(cols["加热"])
+        self.bitmaps = {}
+        for name in TRI_ATTRS:
+            self.bitmaps[name] = np.packbits(cols[name] == 1)
+        self.bitmaps["UL认证"] = np.packbits(cols["UL认证"])
+        self.bitmaps["IP65"] = np.packbits(cols["IP等级"] >= 65)
+        for name in CONNECTOR_ATTRS:
+            for code, value in enumerate(cols[name + "_values"]):
+                self.bitmaps[f"{name}={value}"] = np.packbits(cols[name] == code)
+
+    @classmethod
+    def load(cls, npz_path):
+        with np.load(npz_path) as z:
+            keys = [str(k) for k in z["_keys"]]
+            cols = {k: z[f"c{i}"] for i, k in enumerate(keys)}
+        return cls(cols)
+
+    def connector_values(self, name):
+        return [str(v) for v in self.cols[name + "_values"]]
+
+    def mask(self, names):
+        """
+        对给定位图名做按位与，返回长度为行数的bool数组；位图不存在（如未知插头）时结果全False。
+        AND the named bitmaps together and return a boolean row mask.
+        """
+        acc = None
+        for name in names:
+            bm = self.bitmaps.get(name)
+            if bm is None:
+                return np.zeros(self.rows, dtype=bool)
+            acc = bm.copy() if acc is None else np.bitwise_and(acc, bm, out=acc)
+        if acc is None:
+            return np.ones(self.rows, dtype=bool)
+        return np.unpackbits(acc, count=self.rows).astype(bool)
+
+
+def is_required(val):
+    """判断布尔筛选输入是否为“需要”：支持 True/1/"是"/"true"/"需要" 等。"""
+    if isinstance(val, str):
+        return val.strip().lower() in ("1", "true", "yes", "y", "是", "需要", "带")
+    return bool(val)
+
+
+def filter_names(input_data):
+    """
+    把推荐输入中的属性筛选字段转换为位图名列表，未填写的筛选项忽略。
+    Translate optional attribute filters in input_data into bitmap names.
+    """
+    names = []
+    for key, bm in BOOL_FILTERS.items():
+        if is_required(input_data.get(key)):
+            names.append(bm)
+    for name in CONNECTOR_ATTRS:
+        val = input_data.get(name)
+        if val and str(val).strip() and str(val).strip() not in ("全部", "不限"):
+            family = normalize_connector(val) or str(val).strip()
+            names.append(f"{name}={family}")
+    return names
+
+
+def load_attribute_index(csv_path, store, rows=0):
+    """
+    读取属性文件；不存在、无法读取或内容指纹与 store（DetailStore）不一致时，从 store 中的电池详情重建。
+    数据源没有电池详情列（store为None）时返回 rows 行全部“未说明”的索引，属性筛选均无匹配。
+    Load the attribute index, rebuilding it when its fingerprint does not match the detail store.
+    """
+    if store is None:
+        return AttributeIndex(attribute_columns([None] * rows))
+    npz_path = attribute_path(csv_path)
+    index = None
+    if os.path.exists(npz_path):
+        try:
+            index = AttributeIndex.load(npz_path)
+        except (OSError, KeyError, ValueError):
+            index = None
+    if index is None or index.fingerprint != store.fingerprint:
+        build_attributes([store.get(i) for i in range(len(store))], npz_path)
+        index = AttributeIndex.load(npz_path)
+    return index
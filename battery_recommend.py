@@ -4,20 +4,30 @@ import pandas as pd
 import numpy as np
 import re
 import os
+import atexit
 from ai_utils import openai_search_forklift_model
 from utils import safe_float, parse_battery_size, size_within_limit
+from catalog_store import load_catalog, restore_row, log_memory_report
+from battery_attributes import load_attribute_index, filter_names
 
-all_df = pd.read_csv("all_data.csv")
+# 紧凑数据源：category/降位列，电池详情存于mmap文本文件，仅对返回行读取
+all_df, DETAILS, CATALOG_COLUMNS, CATALOG_MEMORY = load_catalog("all_data.csv")
+log_memory_report(CATALOG_MEMORY)
+if DETAILS is not None:
+    atexit.register(DETAILS.close)
 df = all_df  # 推荐主数据源
+# 电池详情中抽取的属性（加热、4G、插头等）及位图索引，行号与df一致
+ATTRIBUTES = load_attribute_index("all_data.csv", DETAILS, len(all_df))
 VOLTAGE_MAP = dict(zip(all_df["电压(V)"], all_df["对应铅酸电池电压(V)"]))
 CELL_CAPACITIES = sorted(set(all_df["单体电芯容量(Ah)"].dropna().astype(int)))
 
 EUR_USD_RATE = 1.09
 
-def recommend_battery(input_data, _is_fallback=False):
+def recommend_battery(input_data, _is_fallback=False, deadline=None):
     """
     主推荐入口，根据输入参数推荐最优锂电池型号。
     input_data: dict，包含型号、尺寸、容量、品牌等字段
+    deadline: 可选 admission.Deadline，临近截止时停止生成更多结果并置 deadline.truncated=True
     return: 推荐结果dict，或推荐失败信息
     """
     try:
@@ -65,6 +75,13 @@ def recommend_battery(input_data, _is_fallback=False):
                 return {"推荐失败": f"系统中没有{cell_brand}品牌的锂电池型号推荐，建议咨询研发设计人员。"}
         else:
             df_brand = df
+        # 属性筛选（需要加热、放电插头等），位图按位与得到行掩码
+        attr_filters = filter_names(input_data)
+        if attr_filters:
+            attr_mask = ATTRIBUTES.mask(attr_filters)
+            df_brand = df_brand[attr_mask[df_brand.index.to_numpy()]].copy()
+            if df_brand.empty:
+                return {"推荐失败": "系统中没有满足所选配置（" + "、".join(attr_filters) + "）的锂电池型号推荐，建议咨询研发设计人员。"}
         # 后续推荐逻辑全部用df_brand替代df
 
         # 3. 智能电压映射
@@ -96,14 +113,20 @@ def recommend_battery(input_data, _is_fallback=False):
         # 4. 叉车型号模糊推荐（极宽松，包含即出）
         if "适用叉车型号" in input_data and input_data["适用叉车型号"]:
             model_input = str(input_data["适用叉车型号"]).replace(" ", "").strip().lower()
-            df_brand["_型号标准化"] = df_brand["适用叉车型号"].astype(str).replace(" ", "", regex=True).str.strip().str.lower()
+            # 标准化型号为局部Series，不写入共享的df（未按品牌筛选时df_brand即df）
+            model_norm = df_brand["适用叉车型号"].astype(str).replace(" ", "", regex=True).str.strip().str.lower()
             # 只要包含输入字符串的都输出
-            match = df_brand[df_brand["_型号标准化"].str.contains(model_input, na=False)]
+            match = df_brand[model_norm.str.contains(model_input, na=False)]
             if not match.empty:
                 candidates = match.copy()
+                candidates["_型号标准化"] = model_norm[match.index]
                 results = {}
                 for idx, row in candidates.iterrows():
-                    result = row.to_dict()
+                    # 临近截止时间：已有结果则提前返回部分结果
+                    if results and deadline is not None and deadline.near():
+                        deadline.truncated = True
+                        break
+                    result = restore_row(idx, row.to_dict(), DETAILS, CATALOG_COLUMNS)
                     # 字段补全
                     if not result.get("锂电池型号"):
                         for alt in ["推荐电池型号", "型号", "电池型号"]:
@@ -187,8 +210,12 @@ def recommend_battery(input_data, _is_fallback=False):
                 candidates = match.copy()
                 results = {}
                 for idx, row in candidates.head(3).iterrows():
+                    # 临近截止时间：已有结果则提前返回部分结果
+                    if results and deadline is not None and deadline.near():
+                        deadline.truncated = True
+                        break
                     # 先标准化字段名，去除所有key的前后空格
-                    result = {k.strip(): v for k, v in row.to_dict().items()}
+                    result = {k.strip(): v for k, v in restore_row(idx, row.to_dict(), DETAILS, CATALOG_COLUMNS).items()}
                     # 字段补全
                     if not result.get("锂电池型号"):
                         for alt in ["推荐电池型号", "型号", "电池型号"]:
@@ -288,7 +315,11 @@ def recommend_battery(input_data, _is_fallback=False):
                 if not candidates.empty:
                     results = {}
                     for idx, row in candidates.sort_values(["容量差"]).head(3).iterrows():
-                        result = row.to_dict()
+                        # 临近截止时间：已有结果则提前返回部分结果
+                        if results and deadline is not None and deadline.near():
+                            deadline.truncated = True
+                            break
+                        result = restore_row(idx, row.to_dict(), DETAILS, CATALOG_COLUMNS)
                         # 字段补全
                         if not result.get("锂电池型号"):
                             for alt in ["推荐电池型号", "型号", "电池型号"]:
@@ -356,4 +387,16 @@ def recommend_battery(input_data, _is_fallback=False):
         # 返回友好错误提示（去除DEBUG信息）
         return {"推荐失败": "服务异常，请稍后重试。"}
 
+def recommend_with_deadline(input_data, expires_at):
+    """
+    供进程池调用：按绝对截止时间（time.time()）在子进程内重建 Deadline，返回 (推荐结果, 是否被截断)。
+    任务在池中排队期间已过截止时间时不再计算，直接返回 (None, True)。
+    """
+    from admission import Deadline
+    deadline = Deadline.until(expires_at)
+    if deadline.expired():
+        return None, True
+    result = recommend_battery(input_data, deadline=deadline)
+    return result, deadline.truncated
+
 # 可继续扩展其它业务函数
@@ -0,0 +1,211 @@
+# catalog_store.py
+# 推荐数据源（all_data.csv）的紧凑内存表示：
+# - 低基数文本列转为 category，数值列无损降位
+# - 长文本“电池详情”移出 DataFrame，存为偏移索引 + mmap 文本文件，仅对返回的行按需读取
+import gc
+import hashlib
+import os
+import mmap
+import logging
+import numpy as np
+import pandas as pd
+
+DETAIL_COL = "电池详情"
+# 低基数文本列，转为 category（唯一值远少于行数）
+CATEGORY_COLS = ["电芯品牌", "尺寸(mm)", "适用叉车型号", "模组配置(串S并P联）", "含配重(kg)"]
+
+
+def current_rss_kb():
+    """
+    读取当前进程常驻内存（KB），非Linux环境返回0。
+    Return resident set size of the current process in KB (0 if unavailable).
+    """
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return 0
+
+
+def compact_frame(df):
+    """
+    低基数文本列转category，数值列在无损前提下降位，返回新DataFrame。
+    Convert low-cardinality text columns to category and downcast numeric columns losslessly.
+    """
+    out = df.copy()
+    for col in CATEGORY_COLS:
+        if col in out.columns and pd.api.types.is_string_dtype(out[col]):
+            out[col] = out[col].astype("category")
+    for col in out.columns:
+        s = out[col]
+        if pd.api.types.is_integer_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+            out[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            s32 = s.astype(np.float32)
+            # 仅在float32可精确还原时降位（如51.2不能降，否则价格计算会漂移）
+            if ((s32.astype(np.float64) == s) | s.isna()).all():
+                out[col] = s32
+    return out
+
+
+def details_fingerprint(texts):
+    """
+    电池详情内容指纹（sha1前16位）：与修改时间无关，内容或行数任一变化即不同。
+    详情文件与属性文件都以此判断是否需要重建。
+    Content fingerprint of the 电池详情 column, used to detect stale derived files.
+    """
+    h = hashlib.sha1()
+    for t in texts:
+        if t is None or (isinstance(t, float) and t != t):
+            h.update(b"\x01\x00")
+        else:
+            h.update(str(t).encode("utf-8") + b"\x00")
+    return h.hexdigest()[:16]
+
+
+class DetailStore:
+    """
+    电池详情的偏移索引文本存储：所有文本以UTF-8拼接写入 .bin，偏移及内容指纹写入 .idx.npz，读取时mmap。
+    Offset-indexed, memory-mapped text blob for the long 电池详情 column.
+    """
+
+    def __init__(self, bin_path, idx_path):
+        with np.load(idx_path) as z:
+            self.offsets = z["offsets"]
+            self.fingerprint = str(z["fingerprint"])
+        self._f = open(bin_path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        # 空文件不能mmap
+        self._buf = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @staticmethod
+    def build(texts, bin_path, idx_path):
+        """把文本序列写成 .bin + .idx.npz（偏移及内容指纹），缺失值（NaN）记为长度-1。"""
+        offsets = np.zeros((len(texts), 2), dtype=np.int64)
+        pos = 0
+        # 临时文件名带pid，多worker同时重建时互不覆盖
+        bin_tmp = f"{bin_path}.{os.getpid()}.tmp"
+        idx_tmp = f"{idx_path}.{os.getpid()}.tmp"
+        with open(bin_tmp, "wb") as f:
+            for i, t in enumerate(texts):
+                if t is None or (isinstance(t, float) and t != t):
+                    offsets[i] = (pos, -1)
+                    continue
+                b = str(t).encode("utf-8")
+                f.write(b)
+                offsets[i] = (pos, len(b))
+                pos += len(b)
+        with open(idx_tmp, "wb") as f:
+            np.savez(f, offsets=offsets, fingerprint=np.array(details_fingerprint(texts)))
+        os.replace(bin_tmp, bin_path)
+        os.replace(idx_tmp, idx_path)
+
+    def close(self):
+        """关闭mmap及文件句柄（可重复调用）。"""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = b""
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, i):
+        """按行号读取电池详情，缺失返回NaN（与read_csv一致）。"""
+        start, length = (int(x) for x in self.offsets[i])
+        if length < 0:
+            return np.nan
+        return self._buf[start:start + length].decode("utf-8")
+
+
+def detail_paths(csv_path):
+    return csv_path + ".details.bin", csv_path + ".details.idx.npz"
+
+
+def load_catalog(csv_path):
+    """
+    读取CSV并返回 (紧凑DataFrame, DetailStore, 原始列顺序, 内存报告dict)。
+    .bin/.idx.npz 不存在或其内容指纹与CSV中的电池详情不一致时自动重建（不依赖修改时间）。
+    Load the catalog in compact form; rebuild the detail blob when stale.
+    """
+    rss_before = current_rss_kb()
+    raw = pd.read_csv(csv_path)
+    # 原始表（含电池详情）读入后的RSS增量
+    rss_raw = current_rss_kb() - rss_before
+    columns = list(raw.columns)
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    bin_path, idx_path = detail_paths(csv_path)
+    store = None
+    if DETAIL_COL in raw.columns:
+        texts = raw[DETAIL_COL].tolist()
+        if os.path.exists(bin_path) and os.path.exists(idx_path):
+            try:
+                store = DetailStore(bin_path, idx_path)
+            except (OSError, KeyError, ValueError):
+                # 旧格式或损坏的索引文件，重建
+                store = None
+            if store is not None and store.fingerprint != details_fingerprint(texts):
+                store.close()
+                store = None
+        if store is None:
+            DetailStore.build(texts, bin_path, idx_path)
+            store = DetailStore(bin_path, idx_path)
+        raw = raw.drop(columns=[DETAIL_COL])
+    # 紧凑表构建时的RSS增量（原始表此时仍常驻，增量即紧凑表自身占用，含中间副本，偏保守）
+    rss_mid = current_rss_kb()
+    compact = compact_frame(raw)
+    gc.collect()
+    rss_compact = current_rss_kb() - rss_mid
+    del raw
+    report = {
+        "rows": len(compact),
+        "frame_bytes_before": raw_bytes,
+        "frame_bytes_after": int(compact.memory_usage(deep=True).sum()),
+        "rss_kb_before_load": rss_before,
+        "rss_kb_raw_frame": rss_raw,
+        "rss_kb_compact_frame": rss_compact,
+        "rss_kb_after_load": current_rss_kb(),
+        "pid": os.getpid(),
+    }
+    return compact, store, columns, report
+
+
+def restore_row(idx, row_dict, store, columns):
+    """
+    把紧凑表的一行还原为原始列顺序的dict，并按需从DetailStore读取电池详情。
+    Restore a compact row to the original column order, reading 电池详情 lazily.
+    """
+    if store is not None and DETAIL_COL not in row_dict:
+        row_dict[DETAIL_COL] = store.get(idx)
+    ordered = {k: row_dict[k] for k in columns if k in row_dict}
+    for k, v in row_dict.items():
+        if k not in ordered:
+            ordered[k] = v
+    return ordered
+
+
+def log_memory_report(report):
+    logging.info(
+        "[CATALOG MEMORY] pid=%s rows=%s frame %.1fKB -> %.1fKB, RSS raw frame +%sKB, compact frame +%sKB, "
+        "RSS before load %sKB, after load %sKB",
+        report["pid"], report["rows"],
+        report["frame_bytes_before"] / 1024, report["frame_bytes_after"] / 1024,
+        report["rss_kb_raw_frame"], report["rss_kb_compact_frame"],
+        report["rss_kb_before_load"], report["rss_kb_after_load"],
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    _, _, _, rep = load_catalog("all_data.csv")
+    log_memory_report(rep)
@@ -0,0 +1,228 @@
+# fleet_export.py
+# 车队批量报价导出：逐行生成CSV/XLSX字节流，内存占用与车队规模无关，
+# 第一批字节在整个车队计算完成之前即可发送给客户端。
+# XLSX 用 zipfile 直接流式写出（不可寻址输出时自动使用数据描述符），不依赖 openpyxl。
+import concurrent.futures
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from utils import safe_float
+
+# 上传表格中按数值处理的输入字段
+NUMERIC_INPUT_FIELDS = ["电压(V)", "容量(Ah)", "总重量(kg)", "折扣率(%)",
+                        "惠州出厂价(USD)（不含VAT税）", "惠州配重出厂价(USD)（不含VAT税）"]
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?$")
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+NO_MATCH_MESSAGE = "系统中没有匹配的锂电池型号推荐，建议咨询研发设计人员。"
+TIMEOUT_NOTE = "计算超时，未返回结果"
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+class SkipInput(Exception):
+    """recommend 回调抛出，表示该输入未计算（如服务繁忙、导出已超时），异常消息写入备注列。"""
+
+
+def read_fleet_sheet(file_storage, defaults=None):
+    """
+    读取上传的车队表格（CSV 或 XLSX），每行一个推荐输入；至少包含“适用叉车型号”列，
+    表中其它与推荐输入同名的列（如电压(V)、容量(Ah)）逐行覆盖 defaults。
+    Read an uploaded fleet sheet into a list of recommend inputs.
+    """
+    name = (file_storage.filename or "").lower()
+    if name.endswith((".xlsx", ".xls")):
+        # 需要 openpyxl（pandas读取xlsx的引擎）
+        df = pd.read_excel(file_storage.stream, dtype=str)
+    else:
+        df = pd.read_csv(io.TextIOWrapper(file_storage.stream, encoding="utf-8-sig"), dtype=str)
+    df.columns = [str(c).strip() for c in df.columns]
+    if "适用叉车型号" not in df.columns:
+        raise ValueError("表格缺少“适用叉车型号”列")
+    inputs = []
+    for rec in df.to_dict("records"):
+        item = dict(defaults or {})
+        for k, v in rec.items():
+            if v is None or (isinstance(v, float) and v != v) or not str(v).strip():
+                continue
+            item[k] = safe_float(v) if k in NUMERIC_INPUT_FIELDS else str(v).strip()
+        if any(item.get(k) for k in ["适用叉车型号", "电压(V)", "容量(Ah)", "总重量(kg)", "原电池尺寸(mm)"]):
+            inputs.append(item)
+    return inputs
+
+
+def iter_csv(header, rows):
+    """逐行生成UTF-8（带BOM，便于Excel识别）CSV字节块。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(header)
+    yield buf.getvalue().encode("utf-8")
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(row)
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """zipfile的输出目标：收集写入的字节，由生成器取走；不可寻址，zipfile会改用数据描述符。"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_row(values):
+    cells = []
+    for v in values:
+        s = "" if v is None else str(v)
+        if _NUMBER.match(s):
+            cells.append(f'<c><v>{s}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_ILLEGAL.sub("", s))}</t></is></c>')
+    return ("<row>" + "".join(cells) + "</row>").encode("utf-8")
+
+
+def iter_xlsx(header, rows, sheet_name="推荐结果"):
+    """
+    逐行生成XLSX字节块：工作簿结构部分先发出，工作表按行压缩写入，已压缩的数据随即交给客户端。
+    Stream an XLSX workbook row by row in constant memory.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name)))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield sink.drain()
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(_SHEET_HEAD.encode("utf-8"))
+            sheet.write(_xlsx_row(header))
+            for row in rows:
+                sheet.write(_xlsx_row(row))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+    yield sink.drain()
+
+
+def input_summary(input_data):
+    """导出表中“输入”列：型号或关键参数的简述。"""
+    if input_data.get("适用叉车型号"):
+        return str(input_data["适用叉车型号"])
+    parts = []
+    for k in ["原电池类型", "电压(V)", "容量(Ah)", "总重量(kg)", "原电池尺寸(mm)"]:
+        v = input_data.get(k)
+        if v not in (None, "", 0, 0.0):
+            parts.append(f"{k}={v}")
+    return " ".join(parts)
+
+
+def result_items(result):
+    """把 recommend_battery 的多条/单条/列表结果统一为推荐结果dict列表；推荐失败或无结果返回 (None, 提示)。"""
+    if result is None or (isinstance(result, dict) and "推荐失败" in result):
+        msg = result["推荐失败"] if isinstance(result, dict) else NO_MATCH_MESSAGE
+        return None, msg
+    if isinstance(result, dict) and all(isinstance(v, dict) for v in result.values()):
+        items = list(result.values())
+    elif isinstance(result, dict):
+        if "推荐电池型号" in result:
+            result["锂电池型号"] = result.pop("推荐电池型号")
+        items = [result]
+    elif isinstance(result, list):
+        items = [v for v in result if isinstance(v, dict)]
+    else:
+        items = []
+    if not items:
+        return None, NO_MATCH_MESSAGE
+    return items, ""
+
+
+def iter_fleet_rows(inputs, recommend, table_rows, value_count):
+    """
+    逐个输入调用推荐并生成导出行：[序号, 输入, 推荐序号, 结果各列(value_count个)..., 备注]。
+    recommend(input_data) -> (结果, 折扣率, 备注)；table_rows(result, discount) -> [(显示名, 值)]。
+    输入按需逐个计算，推荐失败或异常的输入输出一行带备注的空结果，不中断整个导出。
+    Yield one export row per recommended battery, computing inputs lazily.
+    """
+    blank = [""] * value_count
+    for no, input_data in enumerate(inputs, start=1):
+        summary = input_summary(input_data)
+        try:
+            result, discount, note = recommend(input_data)
+        except SkipInput as e:
+            yield [no, summary, "", *blank, str(e)]
+            continue
+        except (TimeoutError, concurrent.futures.TimeoutError):
+            # str(TimeoutError()) 为空，单独给出超时说明
+            yield [no, summary, "", *blank, TIMEOUT_NOTE]
+            continue
+        except Exception as e:
+            yield [no, summary, "", *blank, f"推荐异常：{e}"]
+            continue
+        items, msg = result_items(result)
+        if items is None:
+            yield [no, summary, "", *blank, msg]
+            continue
+        for rank, item in enumerate(items, start=1):
+            yield [no, summary, rank, *[v for _, v in table_rows(item, discount)], note]
+
+
+def export_header(value_columns):
+    return ["序号", "输入", "推荐序号", *value_columns, "备注"]
+
+
+def content_type(fmt):
+    if fmt == "xlsx":
+        return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return "text/csv"
@@ -0,0 +1,181 @@
+# http_cache.py
+# HTTP缓存与压缩：按数据版本生成强ETag、条件请求返回304、
+# JSON/HTML响应超过阈值时gzip/brotli压缩，静态内容的压缩结果按版本缓存。
+import gzip
+import hashlib
+import os
+import threading
+from flask import Response
+
+try:
+    import brotli  # 可选依赖，未安装时仅使用gzip
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024  # 小于该字节数不压缩
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/html")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_digest_lock = threading.Lock()
+# 路径组合 -> (文件签名, 版本号)；各路径组合互不驱逐
+_digest_memo = {}
+_DIGEST_MEMO_MAX = 32
+
+
+def files_version(paths):
+    """
+    计算一组文件内容的版本号（sha1前16位）；每个路径组合单独缓存，仅在文件大小/修改时间变化时重新读取内容。
+    Return a content hash for the given files, recomputed only when their stat changes.
+    """
+    key = tuple(paths)
+    sig = []
+    for p in key:
+        try:
+            st = os.stat(p)
+            sig.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            sig.append((None, None))
+    sig = tuple(sig)
+    with _digest_lock:
+        memo = _digest_memo.get(key)
+        if memo is not None and memo[0] == sig:
+            return memo[1]
+    h = hashlib.sha1()
+    for p, (size, _) in zip(key, sig):
+        h.update(p.encode("utf-8"))
+        if size is not None:
+            with open(p, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    h.update(chunk)
+    version = h.hexdigest()[:16]
+    with _digest_lock:
+        if key not in _digest_memo and len(_digest_memo) >= _DIGEST_MEMO_MAX:
+            # 路径组合数量正常情况下很少，超出上限时淘汰最早加入的一项
+            del _digest_memo[next(iter(_digest_memo))]
+        _digest_memo[key] = (sig, version)
+    return version
+
+
+def choose_encoding(accept_encoding):
+    """
+    根据 Accept-Encoding 选择压缩方式：优先br（已安装brotli时），其次gzip，否则None。
+    Pick the best supported content coding from an Accept-Encoding header.
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime=0 保证同一内容压缩结果稳定
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class CachedBody:
+    """
+    某一版本的响应体及其预压缩结果（按编码懒生成并缓存），强ETag为 "版本[-编码]"。
+    A versioned response body with lazily cached pre-compressed variants.
+    """
+
+    def __init__(self, body, version, mimetype):
+        self.body = body
+        self.version = version
+        self.mimetype = mimetype
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def etag(self, encoding=None):
+        return f"{self.version}-{encoding}" if encoding else self.version
+
+    def encoded(self, encoding):
+        if not encoding or len(self.body) < COMPRESS_MIN_SIZE:
+            return None, self.body
+        with self._lock:
+            if encoding not in self._encoded:
+                self._encoded[encoding] = compress(self.body, encoding)
+        return encoding, self._encoded[encoding]
+
+    def make_response(self, request, cache_control):
+        """生成响应：If-None-Match 命中任一编码的ETag时返回304，否则返回（可能已压缩的）响应体。"""
+        encoding, body = self.encoded(choose_encoding(request.headers.get("Accept-Encoding")))
+        etag = self.etag(encoding)
+        known = [self.etag(e) for e in (None, "gzip", "br")]
+        if any(request.if_none_match.contains(t) for t in known):
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype=self.mimetype)
+            if encoding:
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = cache_control
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+
+class VersionedCache:
+    """
+    以key缓存 CachedBody，版本变化时调用 build() 重建。
+    Cache CachedBody objects per key, rebuilding when the version changes.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, mimetype, build):
+        item = self._items.get(key)
+        if item is not None and item.version == version:
+            return item
+        body = build()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        item = CachedBody(body, version, mimetype)
+        with self._lock:
+            self._items[key] = item
+        return item
+
+
+def compress_response(response, request):
+    """
+    after_request钩子：对超过阈值的JSON/HTML动态响应按 Accept-Encoding 压缩。
+    已压缩、流式、304等响应原样返回。
+    Compress eligible dynamic responses in an after_request hook.
+    """
+    if (
+        response.status_code < 200 or response.status_code in (204, 304)
+        or response.direct_passthrough or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if not encoding:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,326 @@
+# loadtest.py
+# 端到端HTTP压测：启动 app.py（flask内置服务器或gunicorn多worker），
+# 汇率接口由本地桩服务替代，按权重混合回放 /api/recommend、/api/forklift-models、/ 请求，
+# 输出吞吐量、p50/p95/p99延迟与错误率。全程离线、单机运行。
+#
+# 用法示例：
+#   python3 loadtest.py --modes flask,gunicorn:2,gunicorn:4 --concurrency 1,8,32 --duration 10
+#   python3 loadtest.py --mix recommend=8,models=1,index=1 --stub-delay 0.2 --json result.json
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = "recommend=6,models=2,index=2"
+ENDPOINTS = {
+    "recommend": ("POST", "/api/recommend"),
+    "models": ("GET", "/api/forklift-models"),
+    "index": ("GET", "/"),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_mix(spec):
+    """
+    解析 "recommend=6,models=2,index=2" 形式的权重配置，返回 {端点: 权重}。
+    Parse a weighted endpoint mix such as "recommend=6,models=2,index=2".
+    """
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"未知端点: {name}，可选 {sorted(ENDPOINTS)}")
+        mix[name] = float(weight) if weight.strip() else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("权重配置为空")
+    return mix
+
+
+def parse_mode(spec):
+    """
+    解析服务模式："flask" 或 "gunicorn:<worker数>[:<线程数>]"，返回 (名称, worker数, 线程数)。
+    Parse a serving mode spec like "flask" or "gunicorn:4:2".
+    """
+    parts = spec.strip().split(":")
+    name = parts[0]
+    if name == "flask":
+        return "flask", 1, 0
+    if name == "gunicorn":
+        workers = int(parts[1]) if len(parts) > 1 and parts[1] else 2
+        threads = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+        return "gunicorn", workers, threads
+    raise ValueError(f"未知服务模式: {spec}")
+
+
+def percentile(sorted_vals, p):
+    """对已排序列表取百分位（线性插值），空列表返回0。"""
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def build_recommend_payloads(n, seed):
+    """从推荐数据源生成有代表性的 /api/recommend 请求体（型号查询 + 铅酸/锂电参数查询）。"""
+    rng = random.Random(seed)
+    df = pd.read_csv(os.path.join(BASE_DIR, "all_data.csv"), usecols=["适用叉车型号", "电压(V)", "容量(Ah)", "对应铅酸电池电压(V)"])
+    models = [m for m in df["适用叉车型号"].dropna().astype(str) if m.strip() and m != "N/A"]
+    lead_voltages = sorted(df["对应铅酸电池电压(V)"].dropna().unique().tolist())
+    capacities = sorted(df["容量(Ah)"].dropna().unique().tolist())
+    base = {
+        "折扣率(%)": 100,
+        "惠州出厂价(USD)（不含VAT税）": 230,
+        "惠州配重出厂价(USD)（不含VAT税）": 1.5,
+    }
+    payloads = []
+    for _ in range(n):
+        kind = rng.random()
+        p = dict(base, 电芯品牌=rng.choice(["瑞浦", "EVE", "全部"]))
+        if kind < 0.4 and models:
+            model = rng.choice(models)
+            # 部分请求只用型号前缀，模拟宽泛查询（包含即出）
+            if rng.random() < 0.3:
+                model = model.split(" ")[0]
+            p.update({"适用叉车型号": model, "原电池类型": "铅酸电池", "电压(V)": 0, "容量(Ah)": 0, "总重量(kg)": 0, "原电池尺寸(mm)": ""})
+        elif kind < 0.8:
+            p.update({"适用叉车型号": "", "原电池类型": "铅酸电池", "电压(V)": int(rng.choice(lead_voltages)),
+                      "容量(Ah)": int(rng.choice(capacities) / 0.8), "总重量(kg)": rng.choice([0, 0, 500, 1200]), "原电池尺寸(mm)": ""})
+        else:
+            p.update({"适用叉车型号": "", "原电池类型": "锂电池", "电压(V)": int(rng.choice(lead_voltages)),
+                      "容量(Ah)": int(rng.choice(capacities)), "总重量(kg)": 0, "原电池尺寸(mm)": ""})
+        payloads.append(p)
+    return payloads
+
+
+class RateStub:
+    """
+    本地汇率桩服务，替代 api.exchangerate.host，可配置固定延迟模拟慢外部接口。
+    Local stand-in for the exchange-rate API.
+    """
+
+    def __init__(self, rate=1.08, delay=0.0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = json.dumps({"base": "EUR", "rates": {"USD": stub.rate}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.rate = rate
+        self.delay = delay
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/latest?base=EUR&symbols=USD"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AppServer:
+    """
+    以子进程方式启动被测服务，等待就绪后返回；退出时终止进程。
+    Run app.py under the requested serving mode as a subprocess.
+    """
+
+    def __init__(self, mode, workers, threads, rate_url, log_dir):
+        self.port = free_port()
+        env = dict(os.environ, PORT=str(self.port), EXCHANGE_RATE_URL=rate_url,
+                   RECOMMEND_LOG=os.path.join(log_dir, "recommend.log"))
+        if mode == "flask":
+            cmd = [sys.executable, os.path.join(BASE_DIR, "app.py")]
+        else:
+            gunicorn = shutil.which("gunicorn")
+            if not gunicorn:
+                raise RuntimeError("未安装gunicorn，跳过该模式（pip install gunicorn）")
+            cmd = [gunicorn, "-w", str(workers), "-b", f"127.0.0.1:{self.port}", "--log-level", "warning"]
+            if threads > 1:
+                cmd += ["-k", "gthread", "--threads", str(threads)]
+            cmd.append("app:app")
+        self.stdout = open(os.path.join(log_dir, f"server-{self.port}.out"), "w")
+        self.proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=self.stdout, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"服务进程提前退出，返回码 {self.proc.returncode}，见 {self.stdout.name}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/api/forklift-models")
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("服务启动超时")
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.stdout.close()
+
+
+def run_load(port, mix, payloads, concurrency, duration, seed, timeout=30):
+    """
+    以 concurrency 个线程（各自保持长连接）持续发请求 duration 秒，返回 {端点: [(耗时秒, 是否成功)]} 与实际耗时。
+    Drive the server with a threaded keep-alive client.
+    """
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {n: [] for n in names}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(i):
+        rng = random.Random(seed + i)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        local = {n: [] for n in names}
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, path = ENDPOINTS[name]
+            body, headers = None, {}
+            if method == "POST":
+                body = json.dumps(rng.choice(payloads), ensure_ascii=False).encode("utf-8")
+                headers = {"Content-Type": "application/json"}
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status < 400 or resp.status == 304
+                if resp.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            local[name].append((time.perf_counter() - t0, ok))
+        conn.close()
+        with lock:
+            for n in names:
+                samples[n].extend(local[n])
+
+    t_start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - t_start
+
+
+def summarize(samples, elapsed):
+    """汇总每个端点及全部请求的吞吐量、延迟分位数（毫秒）与错误率。"""
+    rows = {}
+    groups = dict(samples)
+    groups["ALL"] = [s for v in samples.values() for s in v]
+    for name, vals in groups.items():
+        lat = sorted(d for d, _ in vals)
+        errors = sum(1 for _, ok in vals if not ok)
+        rows[name] = {
+            "requests": len(vals),
+            "rps": len(vals) / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": percentile(lat, 50) * 1000,
+            "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000,
+            "error_rate": errors / len(vals) if vals else 0.0,
+        }
+    return rows
+
+
+def print_table(results):
+    header = f"{'mode':<16}{'conc':>5}  {'endpoint':<10}{'reqs':>8}{'rps':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'err%':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        for name, s in r["summary"].items():
+            print(f"{r['mode']:<16}{r['concurrency']:>5}  {name:<10}{s['requests']:>8}{s['rps']:>9.1f}"
+                  f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['error_rate'] * 100:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="叉车锂电池推荐服务端到端压测")
+    parser.add_argument("--modes", default="flask", help="服务模式列表，如 flask,gunicorn:2,gunicorn:4:2")
+    parser.add_argument("--concurrency", default="1,8,32", help="并发数列表，逗号分隔")
+    parser.add_argument("--duration", type=float, default=10, help="每组压测持续秒数")
+    parser.add_argument("--warmup", type=float, default=1, help="每组正式压测前的预热秒数")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="端点权重，如 recommend=6,models=2,index=2")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="汇率桩服务响应延迟（秒）")
+    parser.add_argument("--payloads", type=int, default=500, help="生成的推荐请求体数量")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="结果另存为JSON文件")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    payloads = build_recommend_payloads(args.payloads, args.seed)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    with RateStub(delay=args.stub_delay) as stub, tempfile.TemporaryDirectory() as log_dir:
+        for spec in args.modes.split(","):
+            mode, workers, threads = parse_mode(spec)
+            try:
+                server = AppServer(mode, workers, threads, stub.url, log_dir)
+            except RuntimeError as e:
+                print(f"[SKIP] {spec}: {e}")
+                continue
+            try:
+                server.wait_ready()
+                for c in levels:
+                    if args.warmup > 0:
+                        run_load(server.port, mix, payloads, c, args.warmup, args.seed)
+                    samples, elapsed = run_load(server.port, mix, payloads, c, args.duration, args.seed)
+                    results.append({"mode": spec, "concurrency": c, "elapsed": elapsed, "summary": summarize(samples, elapsed)})
+            except RuntimeError as e:
+                print(f"[FAIL] {spec}: {e}")
+            finally:
+                server.stop()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# reprice.py
+# 历史报价批量重算：解析推荐日志中的 [RECOMMEND INPUT]/[RECOMMEND OUTPUT] 记录，
+# 按锂电池型号关联推荐数据源，在一个或多个价格方案下用NumPy一次性向量化重算
+# 惠州出厂价(USD)、荷兰EXW出货价(EUR)及折后价，输出差异报告。
+#
+# 用法示例：
+#   python3 reprice.py --log flask.log --scenario 涨价:base=250 --scenario 新汇率:rate=1.15,markup=1.25 -o reprice_report.csv
+import argparse
+import ast
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# 与 battery_recommend.py 中的报价公式一致：
+# 惠州出厂价 = 每KWH单价 × KWH + 配重(kg) × 配重单价；荷兰EXW = 惠州出厂价 × 1.2 / 汇率(EUR/USD)
+DEFAULT_HZ_BASE = 230  # USD/KWH
+DEFAULT_WEIGHT_BASE = 1.5  # USD/KG
+DEFAULT_NL_MARKUP = 1.2
+DEFAULT_EUR_USD_RATE = 1.08
+SCENARIO_KEYS = {"base": "hz_base", "weight": "weight_base", "markup": "markup", "rate": "eur_usd_rate"}
+
+_RESULT_SPLIT = re.compile(r"'推荐结果\d+': \{")
+_MODEL = re.compile(r"'锂电池型号': '([^']*)'")
+_COUNTER_WEIGHT = re.compile(r"'配重\(kg\)': ([\d.]+)")
+_HZ_PRICE = re.compile(r"'惠州出厂价\(USD\)': '([\d.]+)'")
+_NL_PRICE = re.compile(r"'荷兰EXW出货价\(EUR\)': '([\d.]+)'")
+
+
+def parse_scenario(spec):
+    """
+    解析价格方案 "名称:base=250,weight=1.6,markup=1.2,rate=1.1"，未给出的项沿用报价时的原值。
+    Parse a scenario price book; omitted keys keep each quote's original value.
+    """
+    name, _, body = spec.partition(":")
+    if not body:
+        name, body = spec, ""
+    book = {}
+    for part in body.split(","):
+        if not part.strip():
+            continue
+        key, _, val = part.partition("=")
+        key = key.strip()
+        if key not in SCENARIO_KEYS:
+            raise ValueError(f"未知价格项: {key}，可选 {sorted(SCENARIO_KEYS)}")
+        book[SCENARIO_KEYS[key]] = float(val)
+    return name.strip() or spec, book
+
+
+def _input_number(input_data, key, default):
+    try:
+        val = float(input_data.get(key, default))
+        return val if val == val else default
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_log(path):
+    """
+    解析推荐日志，每条推荐结果一行，返回DataFrame（报价序号、推荐序号、型号、原价格方案、日志中的原价）。
+    Parse [RECOMMEND INPUT]/[RECOMMEND OUTPUT] pairs into one row per recommended battery.
+    """
+    rows = []
+    quote_no = 0
+    input_data = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("[RECOMMEND INPUT] "):
+                try:
+                    input_data = ast.literal_eval(line[len("[RECOMMEND INPUT] "):].strip())
+                except (ValueError, SyntaxError):
+                    input_data = None
+                continue
+            if not line.startswith("[RECOMMEND OUTPUT] ") or input_data is None:
+                continue
+            quote_no += 1
+            for rank, seg in enumerate(_RESULT_SPLIT.split(line)[1:], start=1):
+                model = _MODEL.search(seg)
+                if not model:
+                    continue
+                cw = _COUNTER_WEIGHT.search(seg)
+                hz = _HZ_PRICE.search(seg)
+                nl = _NL_PRICE.search(seg)
+                rows.append({
+                    "报价序号": quote_no,
+                    "推荐序号": rank,
+                    "适用叉车型号(输入)": input_data.get("适用叉车型号", ""),
+                    "锂电池型号": model.group(1),
+                    "折扣率(%)": _input_number(input_data, "折扣率(%)", 100),
+                    "配重(kg)": float(cw.group(1)) if cw else 0.0,
+                    "hz_base": _input_number(input_data, "惠州出厂价(USD)（不含VAT税）", DEFAULT_HZ_BASE),
+                    "weight_base": _input_number(input_data, "惠州配重出厂价(USD)（不含VAT税）", DEFAULT_WEIGHT_BASE),
+                    "markup": DEFAULT_NL_MARKUP,
+                    "eur_usd_rate": _input_number(input_data, "汇率(EUR/USD)", DEFAULT_EUR_USD_RATE),
+                    "原惠州出厂价(USD)": float(hz.group(1)) if hz else np.nan,
+                    "原荷兰EXW出货价(EUR)": float(nl.group(1)) if nl else np.nan,
+                })
+            input_data = None
+    return pd.DataFrame(rows)
+
+
+def load_kwh(csv_path):
+    """按锂电池型号返回KWH（电压×容量/1000），重复型号取第一条。"""
+    cat = pd.read_csv(csv_path, usecols=["锂电池型号", "电压(V)", "容量(Ah)"])
+    cat = cat.drop_duplicates(subset=["锂电池型号"])
+    return pd.Series((cat["电压(V)"] * cat["容量(Ah)"] / 1000).to_numpy(), index=cat["锂电池型号"].to_numpy(), name="KWH")
+
+
+def price_arrays(kwh, counter_weight, hz_base, weight_base, markup, eur_usd_rate):
+    """
+    向量化报价公式，所有参数为等长数组或标量，返回 (USD, EUR)。
+    Vectorized pricing formula mirroring battery_recommend.recommend_battery.
+    """
+    usd = hz_base * kwh + counter_weight * weight_base
+    eur = usd * markup / eur_usd_rate
+    return usd, eur
+
+
+def _round2(a):
+    # +0.0 把 -0.0 归一为 0.0
+    return np.round(a, 2) + 0.0
+
+
+def reprice(quotes, kwh_by_model, scenarios):
+    """
+    对全部报价在每个价格方案下一次性重算，返回带新旧折后价及差额的报告DataFrame。
+    Re-price every quote line under each scenario in one NumPy pass per scenario.
+    """
+    report = quotes[["报价序号", "推荐序号", "适用叉车型号(输入)", "锂电池型号", "折扣率(%)"]].copy()
+    kwh = quotes["锂电池型号"].map(kwh_by_model).to_numpy(dtype=float)
+    report["已匹配"] = ~np.isnan(kwh)
+    cw = quotes["配重(kg)"].to_numpy(dtype=float)
+    factor = quotes["折扣率(%)"].to_numpy(dtype=float) / 100
+    orig = {k: quotes[k].to_numpy(dtype=float) for k in SCENARIO_KEYS.values()}
+    old_usd, old_eur = price_arrays(kwh, cw, orig["hz_base"], orig["weight_base"], orig["markup"], orig["eur_usd_rate"])
+    report["原折后价(USD)"] = _round2(old_usd * factor)
+    report["原折后价(EUR)"] = _round2(old_eur * factor)
+    # 以当前数据源按原价格方案复算，与日志记录的原价不一致说明数据源已变更
+    report["原价复算偏差(USD)"] = _round2(old_usd - quotes["原惠州出厂价(USD)"].to_numpy(dtype=float))
+    for name, book in scenarios:
+        params = {k: np.full(len(quotes), book[k]) if k in book else orig[k] for k in SCENARIO_KEYS.values()}
+        usd, eur = price_arrays(kwh, cw, params["hz_base"], params["weight_base"], params["markup"], params["eur_usd_rate"])
+        report[f"{name}_折后价(USD)"] = _round2(usd * factor)
+        report[f"{name}_折后价(EUR)"] = _round2(eur * factor)
+        report[f"{name}_差额(USD)"] = _round2((usd - old_usd) * factor)
+        report[f"{name}_差额(EUR)"] = _round2((eur - old_eur) * factor)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            report[f"{name}_变化(%)"] = _round2((usd / old_usd - 1) * 100)
+    return report
+
+
+def summarize(report, scenarios):
+    """每个方案的汇总：匹配行数、原/新折后总价及变化比例。"""
+    matched = report[report["已匹配"]]
+    lines = [f"报价 {report['报价序号'].nunique()} 条，推荐行 {len(report)}，已关联数据源 {len(matched)}"]
+    drift = (matched["原价复算偏差(USD)"].abs() > 0.01).sum()
+    if drift:
+        lines.append(f"其中 {drift} 行按原价格方案复算与日志原价不一致（数据源可能已变更）")
+    for name, _ in scenarios:
+        old = matched["原折后价(USD)"].sum()
+        new = matched[f"{name}_折后价(USD)"].sum()
+        pct = (new / old - 1) * 100 if old else 0.0
+        lines.append(f"[{name}] 折后总价 USD {old:,.2f} -> {new:,.2f}（{pct:+.2f}%），"
+                     f"EUR {matched['原折后价(EUR)'].sum():,.2f} -> {matched[f'{name}_折后价(EUR)'].sum():,.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="历史报价批量重算")
+    parser.add_argument("--log", default=os.environ.get("RECOMMEND_LOG", "flask.log"), help="推荐日志文件")
+    parser.add_argument("--catalog", default="all_data.csv", help="推荐数据源CSV")
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="价格方案，可多次指定，如 涨价:base=250,weight=1.6,markup=1.2,rate=1.1")
+    parser.add_argument("-o", "--output", default="reprice_report.csv", help="差异报告CSV")
+    args = parser.parse_args(argv)
+    if not args.scenario:
+        parser.error("至少指定一个 --scenario")
+    scenarios = [parse_scenario(s) for s in args.scenario]
+
+    t0 = time.perf_counter()
+    quotes = parse_log(args.log)
+    if quotes.empty:
+        print("日志中没有可重算的报价记录")
+        return 1
+    t1 = time.perf_counter()
+    report = reprice(quotes, load_kwh(args.catalog), scenarios)
+    t2 = time.perf_counter()
+    report.to_csv(args.output, index=False, encoding="utf-8-sig")
+    print(summarize(report, scenarios))
+    print(f"解析日志 {t1 - t0:.2f}s，重算 {t2 - t1:.3f}s，报告已写入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# test_admission.py
+import concurrent.futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from admission import AdmissionController, Deadline
+
+class TestAdmission(unittest.TestCase):
+    def test_deadline(self):
+        d = Deadline(10)
+        self.assertFalse(d.expired())
+        self.assertFalse(d.near())
+        self.assertTrue(Deadline(0.1).near())
+        self.assertTrue(Deadline(0).expired())
+    def test_reject_when_queue_full(self):
+        ac = AdmissionController(max_concurrent=1, max_queue=0)
+        self.assertEqual(ac.acquire(Deadline(1)), AdmissionController.ADMITTED)
+        self.assertEqual(ac.acquire(Deadline(1)), AdmissionController.REJECTED)
+        ac.release()
+        self.assertEqual(ac.acquire(Deadline(1)), AdmissionController.ADMITTED)
+        stats = ac.stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["in_flight"]), (2, 1, 1))
+    def test_queue_timeout(self):
+        ac = AdmissionController(max_concurrent=1, max_queue=1)
+        ac.acquire(Deadline(1))
+        self.assertEqual(ac.acquire(Deadline(0.05)), AdmissionController.TIMED_OUT)
+        self.assertEqual(ac.stats()["queue_timeouts"], 1)
+        self.assertEqual(ac.stats()["queued"], 0)
+    def test_queued_request_admitted_after_release(self):
+        ac = AdmissionController(max_concurrent=1, max_queue=1)
+        ac.acquire(Deadline(1))
+        got = []
+        t = threading.Thread(target=lambda: got.append(ac.acquire(Deadline(2))))
+        t.start()
+        time.sleep(0.05)
+        self.assertEqual(ac.stats()["queued"], 1)
+        ac.release()
+        t.join()
+        self.assertEqual(got, [AdmissionController.ADMITTED])
+    def test_deadline_until_wall_clock(self):
+        d = Deadline.until(time.time() + 5)
+        self.assertAlmostEqual(d.remaining(), 5, delta=0.1)
+        self.assertAlmostEqual(d.wall_clock(), time.time() + 5, delta=0.1)
+        self.assertTrue(Deadline.until(time.time() - 1).expired())
+    def test_release_for_waits_for_pending_task(self):
+        ac = AdmissionController(max_concurrent=1, max_queue=0)
+        d = Deadline(1)
+        ac.acquire(d)
+        d.pending = concurrent.futures.Future()
+        ac.release_for(d)
+        # 超时的子进程任务仍在运行，槽位不释放
+        self.assertEqual(ac.acquire(Deadline(1)), AdmissionController.REJECTED)
+        d.pending.set_result(None)
+        self.assertEqual(ac.stats()["in_flight"], 0)
+
+class RecommendApiTestCase(unittest.TestCase):
+    """/api/recommend 测试基类：Flask测试客户端，汇率、日志与准入控制均替换为本地。"""
+
+    @classmethod
+    def setUpClass(cls):
+        import app
+        cls.app = app
+        cls.client = app.app.test_client()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.admission = AdmissionController(max_concurrent=1, max_queue=0)
+        for target, value in [("RECOMMEND_ADMISSION", self.admission),
+                              ("RECOMMEND_LOG", os.path.join(self.tmp.name, "flask.log")),
+                              ("get_eur_usd_rate", lambda timeout=3: 1.08)]:
+            patcher = mock.patch.object(self.app, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def recommend(self, timeout=None):
+        headers = {"X-Request-Timeout": str(timeout)} if timeout is not None else {}
+        return self.client.post("/api/recommend", json={"适用叉车型号": "H"}, headers=headers)
+
+
+class TestRecommendAdmissionApi(RecommendApiTestCase):
+    """/api/recommend 的准入、时限与截断。"""
+
+    def test_recommend_battery_truncates_near_deadline(self):
+        import battery_recommend
+        full = battery_recommend.recommend_battery({"适用叉车型号": "H"})
+        # 时限不超过“临近截止”余量：产生第一条结果后即停止
+        deadline = Deadline(0.2)
+        partial = battery_recommend.recommend_battery({"适用叉车型号": "H"}, deadline=deadline)
+        self.assertTrue(deadline.truncated)
+        self.assertLess(len(partial), len(full))
+        self.assertGreater(len(partial), 0)
+
+    def test_partial_result(self):
+        r = self.recommend(timeout=0.2)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.get_json()["partial"])
+        self.assertNotIn("partial", self.recommend().get_json())
+        self.assertEqual(self.client.get("/api/status").get_json()["recommend"]["truncated"], 1)
+
+    def test_reject_when_queue_full(self):
+        self.admission.acquire(Deadline(1))
+        r = self.recommend()
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.headers["Retry-After"], "1")
+        stats = self.client.get("/api/status").get_json()["recommend"]
+        self.assertEqual((stats["rejected"], stats["in_flight"]), (1, 1))
+
+    def test_deadline_expired(self):
+        r = self.recommend(timeout=0)
+        self.assertEqual(r.status_code, 504)
+        stats = self.client.get("/api/status").get_json()["recommend"]
+        self.assertEqual((stats["deadline_exceeded"], stats["in_flight"]), (1, 0))
+
+class StubPool:
+    """替代进程池：记录提交的参数，返回由测试控制的 Future。"""
+
+    def __init__(self, running=False, result=None):
+        self.running = running
+        self.result = result
+        self.calls = []
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+        future = concurrent.futures.Future()
+        if self.result is not None:
+            future.set_result(self.result)
+        elif self.running:
+            # 已被工作进程取走的任务无法取消
+            future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+
+class TestRecommendProcessPool(RecommendApiTestCase):
+    """RECOMMEND_PROCESS_POOL>0 时 run_recommend 的进程池分支。"""
+
+    def use_pool(self, pool):
+        for target, value in [("RECOMMEND_PROCESS_POOL", 1), ("get_recommend_pool", lambda: pool)]:
+            patcher = mock.patch.object(self.app, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return pool
+
+    def test_submits_wall_clock_deadline(self):
+        import battery_recommend
+        pool = self.use_pool(StubPool(result=({"推荐结果1": {"锂电池型号": "F1"}}, False)))
+        before = time.time()
+        r = self.recommend(timeout=5)
+        self.assertEqual(r.status_code, 200)
+        fn, (input_data, expires_at) = pool.calls[0]
+        self.assertIs(fn, battery_recommend.recommend_with_deadline)
+        self.assertAlmostEqual(expires_at, before + 5, delta=0.5)
+
+    def test_task_started_after_deadline(self):
+        import battery_recommend
+        # 子进程取到任务时已过截止时间：不计算，直接返回 (None, True)
+        self.assertEqual(battery_recommend.recommend_with_deadline({"适用叉车型号": "H"}, time.time() - 1), (None, True))
+        self.use_pool(StubPool(result=(None, True)))
+        r = self.recommend(timeout=5)
+        self.assertEqual(r.status_code, 504)
+        self.assertEqual(self.admission.stats()["deadline_exceeded"], 1)
+
+    def test_queued_task_cancelled_on_timeout(self):
+        pool = self.use_pool(StubPool())
+        r = self.recommend(timeout=0.05)
+        self.assertEqual(r.status_code, 504)
+        self.assertTrue(pool.futures[0].cancelled())
+        stats = self.admission.stats()
+        self.assertEqual((stats.get("abandoned", 0), stats["in_flight"]), (0, 0))
+
+    def test_running_task_keeps_slot_until_done(self):
+        pool = self.use_pool(StubPool(running=True))
+        r = self.recommend(timeout=0.05)
+        self.assertEqual(r.status_code, 504)
+        stats = self.admission.stats()
+        self.assertEqual((stats["abandoned"], stats["in_flight"]), (1, 1))
+        # 槽位仍被超时任务占用，新请求被拒绝
+        self.assertEqual(self.recommend().status_code, 503)
+        pool.futures[0].set_result((None, True))
+        self.assertEqual(self.admission.stats()["in_flight"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
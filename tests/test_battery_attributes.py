@@ -0,0 +1,97 @@
+# test_battery_attributes.py
+import os
+import tempfile
+import unittest
+import pandas as pd
+from catalog_store import load_catalog
+from battery_attributes import normalize_connector, extract_attributes, build_attributes, AttributeIndex, filter_names, load_attribute_index
+
+TEXTS = [
+    "电压：51.2V，配重1381KG，配4G模块和加热功能，充电头：Anderson Euro 320A-Female，放电插头：Anderson SB350 Blue，放电线长为1300mm",
+    "配重：210KG，不带加热功能，带4G模块，放电接头为Rema 320A 母头（UL；IP65认证）",
+    "带加热，不带4G模块，放电口使用安德森350灰色",
+]
+
+class TestBatteryAttributes(unittest.TestCase):
+    def test_normalize_connector(self):
+        self.assertEqual(normalize_connector("Anderson SB350 Gray"), "Anderson SB350")
+        self.assertEqual(normalize_connector("SBE 320 BLACK"), "Anderson SBE320")
+        self.assertEqual(normalize_connector("REMA DIN 320A 母头"), "REMA 320")
+        self.assertEqual(normalize_connector("安德森黑色350"), "Anderson SB350")
+        self.assertIsNone(normalize_connector("线长1.3M"))
+    def test_extract_attributes(self):
+        a = extract_attributes(TEXTS[0])
+        self.assertEqual((a["加热"], a["4G模块"]), (1, 1))
+        self.assertEqual(a["放电插头"], "Anderson SB350")
+        self.assertEqual(a["充电插头"], "Anderson Euro 320")
+        self.assertAlmostEqual(a["放电线长(m)"], 1.3)
+        self.assertEqual(a["详情配重(kg)"], 1381)
+        b = extract_attributes(TEXTS[1])
+        self.assertEqual((b["加热"], b["4G模块"], b["UL认证"], b["IP等级"]), (0, 1, True, 65))
+        self.assertEqual(b["放电插头"], "REMA 320")
+        c = extract_attributes(float("nan"))
+        self.assertEqual((c["加热"], c["放电插头"]), (-1, None))
+    def test_bitmap_filters(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "attrs.npz")
+            build_attributes(TEXTS, path)
+            index = AttributeIndex.load(path)
+        self.assertEqual(index.mask([]).tolist(), [True, True, True])
+        self.assertEqual(index.mask(filter_names({"需要加热": "是"})).tolist(), [True, False, True])
+        self.assertEqual(index.mask(filter_names({"需要加热": True, "放电插头": "sb350"})).tolist(), [True, False, True])
+        self.assertEqual(index.mask(filter_names({"需要4G模块": 1, "需要加热": "是"})).tolist(), [True, False, False])
+        self.assertEqual(index.mask(filter_names({"放电插头": "REMA 999"})).tolist(), [False, False, False])
+        self.assertEqual(filter_names({"需要加热": "", "放电插头": "全部"}), [])
+    def test_index_rebuilt_when_details_change(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = os.path.join(d, "all_data.csv")
+            pd.DataFrame({"锂电池型号": ["F1", "F2"], "电池详情": ["带加热", "详情二"]}).to_csv(csv_path, index=False)
+            _, store, _, _ = load_catalog(csv_path)
+            with store:
+                self.assertEqual(load_attribute_index(csv_path, store).cols["加热"][0], 1)
+            # 内容变化但修改时间更早、行数不变
+            pd.DataFrame({"锂电池型号": ["F1", "F2"], "电池详情": ["不带加热功能", "详情二"]}).to_csv(csv_path, index=False)
+            os.utime(csv_path, (1577836800, 1577836800))
+            _, store, _, _ = load_catalog(csv_path)
+            with store:
+                index = load_attribute_index(csv_path, store)
+            self.assertEqual(index.cols["加热"][0], 0)
+            self.assertEqual(index.mask(filter_names({"需要加热": "是"})).tolist(), [False, False])
+    def test_index_without_details(self):
+        # 数据源没有电池详情列时：不筛选全部保留，任何属性筛选均无匹配
+        index = load_attribute_index("missing.csv", None, 3)
+        self.assertEqual(index.mask([]).tolist(), [True, True, True])
+        self.assertEqual(index.mask(filter_names({"需要加热": "是"})).tolist(), [False, False, False])
+
+class TestRecommendAttributeFilters(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import battery_recommend
+        cls.br = battery_recommend
+
+    def models(self, input_data):
+        result = self.br.recommend_battery(input_data)
+        self.assertNotIn("推荐失败", result)
+        return [v["锂电池型号"] for v in result.values()]
+
+    def attr_rows(self, models, name):
+        df = self.br.df
+        return self.br.ATTRIBUTES.cols[name][df.index[df["锂电池型号"].isin(models)].to_numpy()]
+
+    def test_filters_narrow_results(self):
+        base = self.models({"适用叉车型号": "H"})
+        heated = self.models({"适用叉车型号": "H", "需要加热": "是"})
+        self.assertLess(len(heated), len(base))
+        self.assertTrue(set(heated) <= set(base))
+        self.assertTrue((self.attr_rows(heated, "加热") == 1).all())
+        sb350 = self.models({"适用叉车型号": "H", "放电插头": "SB350"})
+        self.assertLess(len(sb350), len(base))
+        code = self.br.ATTRIBUTES.connector_values("放电插头").index("Anderson SB350")
+        self.assertTrue((self.attr_rows(sb350, "放电插头") == code).all())
+
+    def test_unknown_connector(self):
+        result = self.br.recommend_battery({"适用叉车型号": "H", "放电插头": "REMA 999"})
+        self.assertIn("放电插头=REMA 999", result["推荐失败"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# test_catalog_store.py
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from catalog_store import compact_frame, DetailStore, load_catalog, restore_row
+
+class TestCatalogStore(unittest.TestCase):
+    def test_compact_frame(self):
+        df = pd.DataFrame({
+            "电芯品牌": ["EVE", "瑞浦", "EVE"],
+            "电压(V)": [51.2, 80.0, 25.6],
+            "长(mm)": [1150.0, 1009.0, np.nan],
+            "对应铅酸电池电压(V)": [48, 80, 24],
+        })
+        out = compact_frame(df)
+        self.assertIsInstance(out["电芯品牌"].dtype, pd.CategoricalDtype)
+        # 51.2 无法用float32精确表示，保持float64
+        self.assertEqual(out["电压(V)"].dtype, np.float64)
+        self.assertEqual(out["长(mm)"].dtype, np.float32)
+        self.assertEqual(out["对应铅酸电池电压(V)"].dtype, np.int8)
+        self.assertEqual(out["电压(V)"].tolist(), df["电压(V)"].tolist())
+    def test_detail_store(self):
+        with tempfile.TemporaryDirectory() as d:
+            bin_path, idx_path = os.path.join(d, "x.bin"), os.path.join(d, "x.idx.npz")
+            DetailStore.build(["型号：F48690CM", np.nan, "带加热"], bin_path, idx_path)
+            with DetailStore(bin_path, idx_path) as store:
+                self.assertEqual(len(store), 3)
+                self.assertEqual(store.get(0), "型号：F48690CM")
+                self.assertTrue(pd.isna(store.get(1)))
+                self.assertEqual(store.get(2), "带加热")
+            # 关闭后可重复调用
+            store.close()
+    def test_load_catalog_restores_rows(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = os.path.join(d, "all_data.csv")
+            pd.DataFrame({
+                "锂电池型号": ["F1", "F2"],
+                "电池详情": ["详情一", "详情二"],
+                "电压(V)": [51.2, 80.0],
+            }).to_csv(csv_path, index=False)
+            df, store, columns, report = load_catalog(csv_path)
+            self.addCleanup(store.close)
+            self.assertNotIn("电池详情", df.columns)
+            self.assertLess(report["frame_bytes_after"], report["frame_bytes_before"])
+            self.assertIn("rss_kb_raw_frame", report)
+            self.assertIn("rss_kb_compact_frame", report)
+            row = restore_row(1, df.loc[1].to_dict(), store, columns)
+            self.assertEqual(list(row), ["锂电池型号", "电池详情", "电压(V)"])
+            self.assertEqual(row["电池详情"], "详情二")
+    def test_rebuild_when_content_changes_without_mtime(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = os.path.join(d, "all_data.csv")
+            pd.DataFrame({"锂电池型号": ["F1", "F2"], "电池详情": ["带加热", "详情二"]}).to_csv(csv_path, index=False)
+            _, store, _, _ = load_catalog(csv_path)
+            with store:
+                self.assertEqual(store.get(0), "带加热")
+            # 行数不变、修改时间回拨到更早（如 cp -p / 恢复备份）
+            pd.DataFrame({"锂电池型号": ["F1", "F2"], "电池详情": ["不带加热功能", "详情二"]}).to_csv(csv_path, index=False)
+            os.utime(csv_path, (1577836800, 1577836800))
+            _, store, _, _ = load_catalog(csv_path)
+            with store:
+                self.assertEqual(store.get(0), "不带加热功能")
+    def test_recommend_does_not_mutate_catalog(self):
+        import battery_recommend
+        columns = list(battery_recommend.df.columns)
+        size = battery_recommend.df.memory_usage(deep=True).sum()
+        result = battery_recommend.recommend_battery({"适用叉车型号": "H"})
+        self.assertIn("_型号标准化", result["推荐结果1"])
+        self.assertEqual(list(battery_recommend.df.columns), columns)
+        self.assertEqual(battery_recommend.df.memory_usage(deep=True).sum(), size)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# test_fleet_export.py
+import concurrent.futures
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import zipfile
+import xml.etree.ElementTree as ET
+from werkzeug.datastructures import FileStorage
+from admission import AdmissionController, Deadline
+from fleet_export import SkipInput, TIMEOUT_NOTE, export_header, iter_csv, iter_fleet_rows, iter_xlsx, read_fleet_sheet
+
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def fake_recommend(input_data):
+    if input_data["适用叉车型号"] == "X":
+        return {"推荐失败": "无匹配"}, None, ""
+    if input_data["适用叉车型号"] == "ERR":
+        raise RuntimeError("boom")
+    if input_data["适用叉车型号"] == "SLOW":
+        raise concurrent.futures.TimeoutError()
+    if input_data["适用叉车型号"] == "BUSY":
+        raise SkipInput("服务繁忙，未计算")
+    return {"推荐结果1": {"锂电池型号": "F1"}, "推荐结果2": {"锂电池型号": "F2"}}, 90.0, ""
+
+
+def fake_rows(item, discount):
+    return [("锂电池型号", item["锂电池型号"]), ("折扣", discount)]
+
+
+class TestFleetExport(unittest.TestCase):
+    def rows(self):
+        inputs = [{"适用叉车型号": "A"}, {"适用叉车型号": "X"}, {"适用叉车型号": "ERR"}]
+        return iter_fleet_rows(inputs, fake_recommend, fake_rows, 2)
+
+    def test_fleet_rows(self):
+        rows = list(self.rows())
+        self.assertEqual(rows[0], [1, "A", 1, "F1", 90.0, ""])
+        self.assertEqual(rows[1], [1, "A", 2, "F2", 90.0, ""])
+        self.assertEqual(rows[2], [2, "X", "", "", "", "无匹配"])
+        self.assertTrue(rows[3][-1].startswith("推荐异常"))
+
+    def test_timeout_and_skipped_inputs(self):
+        inputs = [{"适用叉车型号": "SLOW"}, {"适用叉车型号": "BUSY"}]
+        rows = list(iter_fleet_rows(inputs, fake_recommend, fake_rows, 2))
+        self.assertEqual([r[-1] for r in rows], [TIMEOUT_NOTE, "服务繁忙，未计算"])
+
+    def test_csv_stream(self):
+        chunks = iter_csv(export_header(["锂电池型号", "折扣"]), self.rows())
+        first = next(chunks)
+        self.assertTrue(first.startswith(b"\xef\xbb\xbf"))
+        body = (first + b"".join(chunks)).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ["序号", "输入", "推荐序号", "锂电池型号", "折扣", "备注"])
+        self.assertEqual(len(rows), 5)
+
+    def test_xlsx_stream(self):
+        chunks = iter_xlsx(export_header(["锂电池型号", "折扣"]), self.rows())
+        # 工作簿结构部分在计算任何推荐之前即已发出
+        first = next(chunks)
+        self.assertTrue(first.startswith(b"PK"))
+        z = zipfile.ZipFile(io.BytesIO(first + b"".join(chunks)))
+        self.assertIsNone(z.testzip())
+        sheet = ET.fromstring(z.read("xl/worksheets/sheet1.xml"))
+        rows = sheet.find(NS + "sheetData").findall(NS + "row")
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][0].find(NS + "v").text, "1")
+        self.assertEqual(rows[1][3].find(f"{NS}is/{NS}t").text, "F1")
+
+    def test_read_fleet_sheet(self):
+        data = "适用叉车型号,电压(V)\nA,\nB,48\n,\n".encode("utf-8")
+        inputs = read_fleet_sheet(FileStorage(io.BytesIO(data), filename="fleet.csv"), {"折扣率(%)": "90"})
+        self.assertEqual(inputs, [{"折扣率(%)": "90", "适用叉车型号": "A"},
+                                  {"折扣率(%)": "90", "适用叉车型号": "B", "电压(V)": 48.0}])
+        with self.assertRaises(ValueError):
+            read_fleet_sheet(FileStorage(io.BytesIO(b"model\nA\n"), filename="fleet.csv"))
+
+
+class TestExportApi(unittest.TestCase):
+    """/api/export 路由：流式输出、导出准入、推荐槽位与整体时限（汇率与日志均替换为本地）。"""
+
+    MODEL = "Aisle Master 20SHE"
+
+    @classmethod
+    def setUpClass(cls):
+        import app
+        cls.app = app
+        cls.client = app.app.test_client()
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.export_admission = AdmissionController(max_concurrent=1, max_queue=0)
+        self.recommend_admission = AdmissionController(max_concurrent=1, max_queue=0)
+        self.patch(EXPORT_ADMISSION=self.export_admission, RECOMMEND_ADMISSION=self.recommend_admission,
+                   RECOMMEND_LOG=os.path.join(tmp.name, "flask.log"), get_eur_usd_rate=lambda timeout=3: 1.08)
+
+    def patch(self, **values):
+        for target, value in values.items():
+            patcher = mock.patch.object(self.app, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def export(self, inputs, **kwargs):
+        return self.client.post("/api/export?format=csv", json={"inputs": inputs, "defaults": {"折扣率(%)": 90}}, **kwargs)
+
+    def rows(self, resp):
+        return list(csv.reader(io.StringIO(resp.get_data().decode("utf-8-sig"))))
+
+    def test_streams_discounted_rows(self):
+        import battery_recommend
+        expected = battery_recommend.recommend_battery({"适用叉车型号": self.MODEL, "汇率(EUR/USD)": 1.08})
+        resp = self.export([{"适用叉车型号": self.MODEL}, {"适用叉车型号": "NOPE-XYZ"}])
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_streamed)
+        self.assertIn("attachment", resp.headers["Content-Disposition"])
+        header, *rows = self.rows(resp)
+        usd = header.index("惠州出厂价(USD)折后价（不含VAT税）")
+        eur = header.index("荷兰EXW出货价(EUR)折后价（不含VAT税）")
+        found = [r for r in rows if r[0] == "1"]
+        self.assertEqual(len(found), len(expected))
+        for row, item in zip(found, expected.values()):
+            self.assertEqual(row[header.index("锂电池型号")], item["锂电池型号"])
+            self.assertEqual(row[usd], f"{float(item['惠州出厂价(USD)']) * 0.9:.2f}")
+            self.assertEqual(row[eur], f"{float(item['荷兰EXW出货价(EUR)']) * 0.9:.2f}")
+            self.assertEqual(row[header.index("汇率(EUR/USD)")], "1.08")
+        self.assertEqual(rows[-1][0], "2")
+        self.assertTrue(rows[-1][-1])
+        # 每个输入占用并归还一个推荐接口槽位
+        stats = self.client.get("/api/status").get_json()
+        self.assertEqual((stats["recommend"]["admitted"], stats["recommend"]["in_flight"]), (2, 0))
+
+    def test_concurrent_export_rejected_until_closed(self):
+        first = self.export([{"适用叉车型号": self.MODEL}], buffered=False)
+        second = self.export([{"适用叉车型号": self.MODEL}])
+        self.assertEqual(second.status_code, 503)
+        self.assertEqual(second.headers["Retry-After"], "10")
+        self.assertEqual(self.export_admission.stats()["in_flight"], 1)
+        first.close()
+        self.assertEqual(self.export_admission.stats()["in_flight"], 0)
+        self.assertEqual(self.export([{"适用叉车型号": self.MODEL}]).status_code, 200)
+
+    def test_export_timeout_skips_inputs(self):
+        self.patch(EXPORT_TIMEOUT=0)
+        header, *rows = self.rows(self.export([{"适用叉车型号": self.MODEL}, {"适用叉车型号": "H"}]))
+        self.assertEqual([r[-1] for r in rows], ["导出超时，未计算"] * 2)
+        self.assertEqual(self.export_admission.stats()["deadline_exceeded"], 1)
+        self.assertEqual(self.recommend_admission.stats()["admitted"], 0)
+
+    def test_busy_recommend_queue_skips_inputs(self):
+        self.patch(RECOMMEND_TIMEOUT=0.1, EXPORT_SLOT_RETRY=0.02)
+        self.recommend_admission.acquire(Deadline(1))
+        header, *rows = self.rows(self.export([{"适用叉车型号": self.MODEL}]))
+        self.assertEqual([r[-1] for r in rows], ["服务繁忙，未计算"])
+        # 排队已满时等待重试，而不是立即放弃
+        self.assertGreater(self.recommend_admission.stats()["rejected"], 1)
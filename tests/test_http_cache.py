@@ -0,0 +1,68 @@
+# test_http_cache.py
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask, request
+import http_cache
+from http_cache import files_version, choose_encoding, VersionedCache, compress_response, COMPRESS_MIN_SIZE
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.cache = VersionedCache()
+        self.version = "v1"
+        self.builds = 0
+        def build():
+            self.builds += 1
+            return '["' + "x" * COMPRESS_MIN_SIZE + '"]'
+        @self.app.route("/list")
+        def listing():
+            return self.cache.get("list", self.version, "application/json", build).make_response(request, "public, max-age=300")
+        @self.app.route("/small")
+        def small():
+            return {"ok": True}
+        self.app.after_request(lambda resp: compress_response(resp, request))
+        self.client = self.app.test_client()
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, identity"))
+        self.assertIsNone(choose_encoding(""))
+    def test_etag_and_304(self):
+        r = self.client.get("/list", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(r.headers["Content-Encoding"], "gzip")
+        self.assertEqual(r.headers["ETag"], '"v1-gzip"')
+        self.assertEqual(r.headers["Cache-Control"], "public, max-age=300")
+        self.assertTrue(gzip.decompress(r.data).startswith(b'["x'))
+        r2 = self.client.get("/list", headers={"If-None-Match": '"v1-gzip"'})
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(self.builds, 1)
+        # 版本变化后ETag失效并重建
+        self.version = "v2"
+        r3 = self.client.get("/list", headers={"If-None-Match": '"v1-gzip"'})
+        self.assertEqual(r3.status_code, 200)
+        self.assertEqual(r3.headers["ETag"], '"v2"')
+        self.assertEqual(self.builds, 2)
+    def test_small_response_not_compressed(self):
+        r = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", r.headers)
+        self.assertEqual(r.get_json(), {"ok": True})
+    def test_files_version_memo_per_path_set(self):
+        with tempfile.TemporaryDirectory() as d:
+            a, b = os.path.join(d, "a.csv"), os.path.join(d, "b.html")
+            for p in (a, b):
+                with open(p, "w") as f:
+                    f.write(p)
+            va, vb = files_version([a]), files_version([b])
+            # 交替请求不同路径组合时不应互相驱逐、重新读取文件
+            with mock.patch.object(http_cache.hashlib, "sha1", side_effect=AssertionError("rehashed")):
+                for _ in range(3):
+                    self.assertEqual(files_version([a]), va)
+                    self.assertEqual(files_version([b]), vb)
+            with open(a, "w") as f:
+                f.write("changed content")
+            self.assertNotEqual(files_version([a]), va)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+# test_loadtest.py
+import unittest
+from loadtest import parse_mix, parse_mode, percentile, summarize
+
+class TestLoadtest(unittest.TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("recommend=6,models=2,index=2"), {"recommend": 6.0, "models": 2.0, "index": 2.0})
+        self.assertEqual(parse_mix("recommend"), {"recommend": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("unknown=1")
+    def test_parse_mode(self):
+        self.assertEqual(parse_mode("flask"), ("flask", 1, 0))
+        self.assertEqual(parse_mode("gunicorn:4"), ("gunicorn", 4, 1))
+        self.assertEqual(parse_mode("gunicorn:2:8"), ("gunicorn", 2, 8))
+        with self.assertRaises(ValueError):
+            parse_mode("uwsgi")
+    def test_percentile(self):
+        vals = [float(i) for i in range(1, 101)]
+        self.assertAlmostEqual(percentile(vals, 50), 50.5)
+        self.assertAlmostEqual(percentile(vals, 99), 99.01)
+        self.assertEqual(percentile([], 99), 0.0)
+    def test_summarize(self):
+        rows = summarize({"models": [(0.01, True), (0.03, False)]}, 2.0)
+        self.assertEqual(rows["ALL"]["requests"], 2)
+        self.assertAlmostEqual(rows["models"]["rps"], 1.0)
+        self.assertAlmostEqual(rows["models"]["error_rate"], 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+# test_reprice.py
+import os
+import tempfile
+import unittest
+import pandas as pd
+from reprice import parse_scenario, parse_log, reprice
+
+LOG = (
+    "\n[RECOMMEND INPUT] {'适用叉车型号': 'Bendi B320', '折扣率(%)': 90, '惠州出厂价(USD)（不含VAT税）': 230, "
+    "'惠州配重出厂价(USD)（不含VAT税）': 1.5, '汇率(EUR/USD)': 1.08}\n"
+    "[RECOMMEND OUTPUT] {'推荐结果1': {'锂电池型号': 'F48628C', '模组串并联方式': nan, '含配重(kg)': 771, "
+    "'配重(kg)': 0, '惠州出厂价(USD)': '7395.33', '荷兰EXW出货价(EUR)': '8217.03'}, "
+    "'推荐结果2': {'锂电池型号': 'F00000X', '配重(kg)': 10, '惠州出厂价(USD)': '1.00', '荷兰EXW出货价(EUR)': '1.00'}}\n"
+    "\n[RECOMMEND INPUT] {'适用叉车型号': ''}\n"
+    "[RECOMMEND OUTPUT] {'推荐失败': '系统中没有匹配的锂电池型号推荐，建议咨询研发设计人员。'}\n"
+)
+
+class TestReprice(unittest.TestCase):
+    def test_parse_scenario(self):
+        self.assertEqual(parse_scenario("涨价:base=250,rate=1.1"), ("涨价", {"hz_base": 250.0, "eur_usd_rate": 1.1}))
+        with self.assertRaises(ValueError):
+            parse_scenario("x:foo=1")
+    def test_parse_and_reprice(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "flask.log")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(LOG)
+            quotes = parse_log(path)
+        self.assertEqual(quotes["锂电池型号"].tolist(), ["F48628C", "F00000X"])
+        self.assertEqual(quotes["配重(kg)"].tolist(), [0.0, 10.0])
+        kwh = pd.Series({"F48628C": 51.2 * 628 / 1000})
+        report = reprice(quotes, kwh, [("涨价", {"hz_base": 250.0}), ("汇率", {"eur_usd_rate": 1.2})])
+        first = report.iloc[0]
+        self.assertTrue(first["已匹配"])
+        self.assertEqual(first["原价复算偏差(USD)"], 0.0)
+        self.assertAlmostEqual(first["原折后价(USD)"], 7395.33 * 0.9, places=1)
+        self.assertAlmostEqual(first["涨价_折后价(USD)"], round(250 * 51.2 * 628 / 1000 * 0.9, 2))
+        self.assertAlmostEqual(first["汇率_折后价(EUR)"], round(7395.328 * 1.2 / 1.2 * 0.9, 2), places=1)
+        self.assertEqual(first["汇率_差额(USD)"], 0.0)
+        self.assertFalse(report.iloc[1]["已匹配"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -109,5 +109,11 @@ try:
     all_df = all_df.drop_duplicates(subset=["锂电池型号", "适用叉车型号", "电芯品牌"])
     all_df.to_csv("all_data.csv", index=False)
     print("已生成 all_data.csv，合并推荐数据源。")
+    # 预生成电池详情的mmap文件，服务启动时无需重建
+    from catalog_store import DetailStore, detail_paths
+    DetailStore.build(all_df["电池详情"].tolist(), *detail_paths("all_data.csv"))
+    # 从电池详情中一次性抽取属性（加热、4G、插头、认证等），供推荐时位图筛选
+    from battery_attributes import build_attributes, attribute_path
+    build_attributes(all_df["电池详情"].tolist(), attribute_path("all_data.csv"))
 except Exception as e:
     print(f"[WARN] all_data.csv 生成失败: {e}")